@@ -0,0 +1,167 @@
+"""
+Persistent cache of song analysis results
+
+Analysis results (tempo, beats, downbeats, sections, ...) are keyed by a hash
+of the decoded audio, so the same master reprocessed with different
+parameters skips beat tracking and feature extraction. Results are kept in
+memory and as .npz files on disk; the disk cache is trimmed to a size limit
+by evicting the least recently used entries. The disk cache lives in the
+user's cache directory (NUANCE_ANALYSIS_CACHE_DIR, else
+$XDG_CACHE_HOME/nuance-generator/analysis, else ~/.cache/...) and is only
+created once something is stored in it.
+"""
+
+import hashlib
+import json
+import os
+import uuid
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+
+from sample_cache import LRUBufferCache
+
+# Bump whenever analysis output changes so stale cache entries are ignored
+ANALYSIS_VERSION = 6
+
+
+def default_cache_dir() -> Path:
+    """Per-user analysis cache directory, independent of the working directory"""
+    configured = os.environ.get('NUANCE_ANALYSIS_CACHE_DIR')
+    if configured:
+        return Path(configured).expanduser()
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return Path(cache_home) / 'nuance-generator' / 'analysis'
+
+
+DEFAULT_CACHE_DIR = default_cache_dir()
+
+
+class ContentHash:
+    """Incremental content_hash of audio fed as blocks of frames (frames x channels)"""
+
+    def __init__(self, sr: int, dtype):
+        self.sr = sr
+        self.dtype = np.dtype(dtype)
+        self.frames = 0
+        self.channels = 0
+        self._digest = hashlib.blake2b(digest_size=20)
+
+    def update(self, block: np.ndarray):
+        self._digest.update(np.ascontiguousarray(block, dtype=self.dtype).data)
+        self.frames += block.shape[0]
+        self.channels = block.shape[1]
+
+    def hexdigest(self) -> str:
+        digest = self._digest.copy()
+        digest.update(f"v{ANALYSIS_VERSION}:{self.sr}:{self.dtype}:{self.channels}x{self.frames}".encode())
+        return digest.hexdigest()
+
+
+def content_hash(audio: np.ndarray, sr: int, block_size: int = 65536) -> str:
+    """Hash of decoded audio content (samples, layout and sample rate)
+    
+    Samples are hashed interleaved, as a file is read, so a streaming decode
+    (ContentHash fed block by block) gets the same hash.
+    """
+    frames = audio.reshape(1, -1) if audio.ndim == 1 else audio
+    hasher = ContentHash(sr, audio.dtype)
+    for start in range(0, frames.shape[-1], block_size):
+        hasher.update(frames[:, start:start + block_size].T)
+    return hasher.hexdigest()
+
+
+class AnalysisCache:
+    """Two-level (memory + disk) cache of analysis results keyed by content hash"""
+
+    def __init__(self, cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+                 max_disk_bytes: int = 256 * 1024 * 1024,
+                 max_memory_bytes: int = 64 * 1024 * 1024):
+        self.cache_dir = Path(cache_dir).expanduser() if cache_dir else None
+        self.max_disk_bytes = max_disk_bytes
+        self.memory = LRUBufferCache(max_memory_bytes)
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Return cached analysis features for a content hash, or None"""
+        features = self.memory.get(key)
+        if features is not None:
+            return features
+
+        path = self._path(key)
+        if path is None or not path.exists():
+            return None
+        try:
+            features = self._load(path)
+        except Exception as e:
+            print(f"Ignoring unreadable analysis cache entry {path}: {e}")
+            path.unlink(missing_ok=True)
+            return None
+
+        try:
+            os.utime(path)  # Mark as recently used for eviction
+        except OSError:
+            pass  # Evicted by another process meanwhile; the loaded copy is still good
+        self.memory.put(key, features, self._nbytes(features))
+        return features
+
+    def put(self, key: str, features: Dict):
+        """Store analysis features (arrays and JSON-serializable values)
+
+        The disk copy is best-effort: if the cache directory can't be written
+        (missing, read-only or full), the entry is kept in memory only.
+        """
+        self.memory.put(key, features, self._nbytes(features))
+
+        path = self._path(key)
+        if path is None:
+            return
+        arrays = {k: v for k, v in features.items() if isinstance(v, np.ndarray)}
+        meta = {k: v for k, v in features.items() if not isinstance(v, np.ndarray)}
+        # Unique scratch name so concurrent renders of one song don't collide
+        tmp_path = path.with_name(f"{key}.{uuid.uuid4().hex}.tmp.npz")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            np.savez(tmp_path, _meta=np.array(json.dumps(meta)), **arrays)
+            os.replace(tmp_path, path)
+            self._evict()
+        except OSError as e:
+            print(f"Not saving analysis cache entry {path}: {e}")
+            try:
+                tmp_path.unlink(missing_ok=True)
+            except OSError:
+                pass
+
+    def _path(self, key: str) -> Optional[Path]:
+        return self.cache_dir / f"{key}.npz" if self.cache_dir is not None else None
+
+    @staticmethod
+    def _load(path: Path) -> Dict:
+        with np.load(path, allow_pickle=False) as data:
+            features = json.loads(str(data['_meta']))
+            features.update({k: data[k] for k in data.files if k != '_meta'})
+        return features
+
+    @staticmethod
+    def _nbytes(features: Dict) -> int:
+        # Arrays dominate; count a small fixed overhead for the rest
+        return 1024 + sum(v.nbytes for v in features.values() if isinstance(v, np.ndarray))
+
+    def _evict(self):
+        """Delete least recently used entries until the disk cache fits its budget"""
+        entries = []
+        for path in self.cache_dir.glob("*.npz"):
+            if path.name.endswith('.tmp.npz'):
+                continue  # Still being written
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries, key=lambda entry: entry[0]):
+            if total <= self.max_disk_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
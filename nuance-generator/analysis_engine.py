@@ -0,0 +1,224 @@
+"""
+Spectral features of a song for analysis
+
+Features are extracted from a mono fold-down decimated to the analysis rate
+(22050 Hz by default), while the native-rate audio is kept for rendering.
+Streaming analyses fold and decimate the song block by block instead
+(StreamingResampler), giving the same analysis-rate signal.
+One power spectrogram is computed and shared: the onset envelope that
+drives beat tracking and the chroma and MFCCs used for sections are all
+derived from it. Every feature is computed on first access, so features nobody asks for
+cost nothing.
+"""
+
+import math
+from functools import cached_property
+from typing import List, Tuple
+
+import librosa
+import numpy as np
+import scipy.signal
+import soxr
+
+from profiler import stage
+
+ANALYSIS_SR = 22050
+N_FFT = 2048
+HOP_LENGTH = 512
+STFT_BLOCK_FRAMES = 2048  # Frames per block of the power spectrogram
+
+
+class StreamingResampler:
+    """Resamples a mono signal fed in blocks, matching librosa.resample on the whole signal
+    
+    Uses the same soxr filter ('soxr_hq', librosa's default) as a stream and
+    pads or trims the result to librosa's output length.
+    """
+
+    def __init__(self, orig_sr: int, target_sr: int, dtype=np.float32):
+        self.orig_sr = orig_sr
+        self.target_sr = target_sr
+        self.dtype = np.dtype(dtype)
+        self._stream = (soxr.ResampleStream(orig_sr, target_sr, 1, dtype=self.dtype, quality='HQ')
+                        if orig_sr != target_sr else None)
+        self._chunks: List[np.ndarray] = []
+        self._length = 0
+
+    def add(self, block: np.ndarray):
+        """Feed the next block of the signal"""
+        self._length += len(block)
+        self._chunks.append(block if self._stream is None else self._stream.resample_chunk(block))
+
+    def result(self) -> np.ndarray:
+        """The whole resampled signal (call once, after the last block)"""
+        if self._stream is not None:
+            self._chunks.append(self._stream.resample_chunk(np.zeros(0, dtype=self.dtype), last=True))
+        y = np.concatenate(self._chunks) if self._chunks else np.zeros(0, dtype=self.dtype)
+        self._chunks = []
+        length = math.ceil(self._length * self.target_sr / self.orig_sr)
+        return librosa.util.fix_length(y, size=length)
+
+
+class SongFeatures:
+    """Lazily computed spectral features of one song at the analysis rate"""
+
+    def __init__(self, y_mono: np.ndarray, sr: int, analysis_sr: int = ANALYSIS_SR):
+        # Only ever decimate; songs already below the analysis rate are used as is
+        self.sr = min(sr, analysis_sr)
+        if sr != self.sr:
+            with stage('analysis_resample', 'analysis'):
+                y_mono = librosa.resample(y_mono, orig_sr=sr, target_sr=self.sr)
+        self.y = y_mono
+        self.hop_length = HOP_LENGTH
+
+    @cached_property
+    def power(self) -> np.ndarray:
+        """Power spectrogram (1 + N_FFT/2 bins x frames), the one STFT of the song"""
+        # Computed a block of frames at a time (frame for frame what a centered
+        # librosa.stft gives), so the complex STFT of the whole song never exists
+        with stage('stft', 'analysis'):
+            padded = np.pad(self.y, N_FFT // 2)
+            frames = 1 + (len(padded) - N_FFT) // self.hop_length
+            power = np.empty((1 + N_FFT // 2, frames), dtype=self.y.dtype)
+            for first in range(0, frames, STFT_BLOCK_FRAMES):
+                last = min(frames, first + STFT_BLOCK_FRAMES)
+                segment = padded[first * self.hop_length:(last - 1) * self.hop_length + N_FFT]
+                power[:, first:last] = np.abs(librosa.stft(segment, n_fft=N_FFT, hop_length=self.hop_length,
+                                                           center=False)) ** 2
+            return power
+
+    @cached_property
+    def mel_db(self) -> np.ndarray:
+        """Log-power mel spectrogram (dB), shared by onsets and timbre"""
+        with stage('mel', 'analysis'):
+            return librosa.power_to_db(librosa.feature.melspectrogram(S=self.power, sr=self.sr))
+
+    @cached_property
+    def onset_envelope(self) -> np.ndarray:
+        """Spectral-flux onset strength per frame, as librosa's beat tracker computes it"""
+        with stage('onset_envelope', 'analysis'):
+            return librosa.onset.onset_strength(S=self.mel_db, sr=self.sr, hop_length=self.hop_length,
+                                                aggregate=np.median)
+
+    @cached_property
+    def mfcc(self) -> np.ndarray:
+        """13 x frames MFCCs (timbre), from the shared mel spectrogram"""
+        with stage('mfcc', 'analysis'):
+            return librosa.feature.mfcc(S=self.mel_db, n_mfcc=13)
+
+    @cached_property
+    def frame_level(self) -> np.ndarray:
+        """Magnitude (square root of total power) of each frame"""
+        return np.sqrt(self.power.sum(axis=0))
+
+    @cached_property
+    def chroma(self) -> np.ndarray:
+        """12 x frames chroma, from the shared spectrogram"""
+        with stage('chroma', 'analysis'):
+            return librosa.feature.chroma_stft(S=self.power, sr=self.sr, n_fft=N_FFT, hop_length=self.hop_length,
+                                               tuning=self.tuning)
+
+    @cached_property
+    def tuning(self) -> float:
+        """Tuning offset (in chroma bins), as librosa.estimate_tuning finds it
+
+        Peaks are picked a block of frames at a time (picking is per frame),
+        so only the peaks, not several spectrogram-sized arrays, are held.
+        """
+        pitches, magnitudes = [], []
+        for first in range(0, self.power.shape[1], STFT_BLOCK_FRAMES):
+            pitch, magnitude = librosa.piptrack(S=self.power[:, first:first + STFT_BLOCK_FRAMES],
+                                                sr=self.sr, n_fft=N_FFT)
+            peaks = pitch > 0
+            pitches.append(pitch[peaks])
+            magnitudes.append(magnitude[peaks])
+        pitch, magnitude = np.concatenate(pitches), np.concatenate(magnitudes)
+        threshold = np.median(magnitude) if len(magnitude) else 0.0
+        return librosa.pitch_tuning(pitch[magnitude >= threshold], bins_per_octave=12)
+
+    def beat_track(self) -> Tuple[float, np.ndarray]:
+        """Tempo (BPM) and beat times (seconds) from the onset envelope"""
+        tempo, beats = librosa.beat.beat_track(onset_envelope=self.onset_envelope, sr=self.sr,
+                                               hop_length=self.hop_length, units='time')
+        return float(np.atleast_1d(tempo)[0]), beats
+
+    def frame_times(self, frames: np.ndarray) -> np.ndarray:
+        return librosa.frames_to_time(frames, sr=self.sr, hop_length=self.hop_length)
+
+    def beat_sync(self, features: np.ndarray, beats: np.ndarray) -> np.ndarray:
+        """Median of frame features (dims x frames) over each beat: dims x beats
+
+        Column i covers beat i up to the next beat (or the end of the song).
+        """
+        frames = librosa.time_to_frames(beats, sr=self.sr, hop_length=self.hop_length)
+        frames = np.clip(frames, 0, features.shape[-1] - 1)
+        # sync() pads the boundaries with 0; the segment before the first beat is dropped
+        return librosa.util.sync(features, frames, aggregate=np.median)[:, -len(beats):]
+
+    def beat_features(self, beats: np.ndarray) -> np.ndarray:
+        """Compact beat-synchronous description of harmony and timbre (dims x beats)
+
+        Each dimension is standardized over the song and each beat's vector
+        normalized, so dot products between beats are cosine similarities.
+        """
+        with stage('beat_features', 'analysis'):
+            chroma = self.beat_sync(self.chroma, beats)
+            chroma /= np.maximum(np.linalg.norm(chroma, axis=0), 1e-9)
+            timbre = self.beat_sync(self.mfcc[1:], beats)  # Drop MFCC 0 (overall level)
+            features = np.vstack([chroma, timbre])
+            features -= features.mean(axis=1, keepdims=True)
+            features /= np.maximum(features.std(axis=1, keepdims=True), 1e-9)
+            features /= np.maximum(np.linalg.norm(features, axis=0), 1e-9)
+            return features
+
+    def beat_energy(self, beats: np.ndarray) -> np.ndarray:
+        """Mean mel level (dB) per beat"""
+        return self.beat_sync(self.mel_db.mean(axis=0, keepdims=True), beats)[0]
+
+    def release(self):
+        """Drop the spectrograms once every needed feature has been derived"""
+        self.__dict__.pop('power', None)
+        self.__dict__.pop('mel_db', None)
+
+
+def checkerboard_novelty(features: np.ndarray, half_width: int) -> np.ndarray:
+    """Novelty per column of a feature sequence (dims x beats) from a Gaussian checkerboard kernel
+
+    The kernel only ever sees the band of the self-similarity matrix within
+    `half_width` of the diagonal, so the band is computed one lag at a time
+    (the similarity of every beat with the beat `lag` later) and each lag's
+    kernel weights are applied by correlation. Cost is
+    O(beats * half_width * (dims + half_width)): linear in song length.
+    """
+    num_beats = features.shape[1]
+    if num_beats == 0:
+        return np.zeros(0)
+    width = 2 * half_width
+    # Extend the sequence by repeating its ends so the kernel fits at the edges
+    padded = np.pad(features, ((0, 0), (half_width, half_width)), mode='edge')
+
+    # Kernel weight of offsets a, b around the centre: + within a side, - across it
+    offsets = np.arange(-half_width, half_width)
+    taper = np.exp(-0.5 * ((offsets + 0.5) / (0.5 * half_width)) ** 2)
+    sides = np.where(offsets < 0, -1.0, 1.0)
+
+    novelty = np.zeros(num_beats)
+    for lag in range(1, width):
+        similarity = np.einsum('ij,ij->j', padded[:, :-lag], padded[:, lag:])
+        # Weights of the pairs (a, a + lag) for every a that keeps both offsets in the kernel
+        weights = 2 * sides[:width - lag] * sides[lag:] * taper[:width - lag] * taper[lag:]
+        novelty += scipy.signal.correlate(similarity, weights, mode='valid')[:num_beats]
+    return np.maximum(novelty, 0.0)
+
+
+def novelty_boundaries(novelty: np.ndarray, min_distance: int, threshold: float = 0.3) -> List[int]:
+    """Beats where the novelty curve peaks, at least `min_distance` beats apart
+
+    Peaks must stand out from their surroundings by `threshold` times the
+    largest peak, so a song without clear changes keeps a single section.
+    """
+    if len(novelty) == 0 or novelty.max() <= 0:
+        return []
+    peaks, _ = scipy.signal.find_peaks(novelty, distance=max(1, min_distance),
+                                       prominence=threshold * novelty.max())
+    return [int(peak) for peak in peaks if min_distance <= peak <= len(novelty) - min_distance]
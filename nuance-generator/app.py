@@ -1,16 +1,42 @@
-from flask import Flask, request, jsonify, render_template, send_file
+from flask import Flask, Request, Response, request, jsonify, render_template, send_file, url_for
+import io
 import os
 import tempfile
-import uuid
 from werkzeug.utils import secure_filename
 from nuance_generator import SongNuanceGenerator
+from beat_tracking import DEFAULT_BEAT_TRACKER, available_beat_trackers, get_beat_tracker
+from job_queue import JobQueue, QueueFull
+from sample_cache import LRUBufferCache
+from audio_stream import AUDIO_FORMATS, encode_chunks, wav_size
 import json
 
+class InMemoryUploadRequest(Request):
+    """Keeps uploaded files in memory (bounded by MAX_CONTENT_LENGTH) instead of
+    spooling large ones to temp files, so songs are decoded straight from the request"""
+    
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return io.BytesIO()
+
 app = Flask(__name__)
+app.request_class = InMemoryUploadRequest
 app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB max file size
 
-# Initialize the generator
-generator = SongNuanceGenerator("samples")
+# Initialize the generator, keeping a stock of AI samples synthesized in the background
+PREFETCH_DEPTH = int(os.environ.get('NUANCE_PREFETCH_DEPTH', 16))
+generator = SongNuanceGenerator("samples", prefetch_depth=PREFETCH_DEPTH)
+
+# Renders run as background jobs on a bounded pool; finished outputs expire after the TTL
+# Each render keeps its own session state, so jobs share one generator in parallel
+JOB_WORKERS = int(os.environ.get('NUANCE_JOB_WORKERS', 2))
+JOB_QUEUE_SIZE = int(os.environ.get('NUANCE_JOB_QUEUE_SIZE', 16))
+JOB_TTL = float(os.environ.get('NUANCE_JOB_TTL', 3600))
+jobs = JobQueue(JOB_WORKERS, JOB_QUEUE_SIZE, JOB_TTL, os.environ.get('NUANCE_JOB_DIR'))
+
+# Analyses (with decoded audio) from /api/analyze, keyed by content hash, so a
+# following /api/process can pass the token instead of re-uploading the song
+ANALYSIS_TTL = float(os.environ.get('NUANCE_ANALYSIS_TTL', 900))
+ANALYSIS_STORE_BYTES = int(os.environ.get('NUANCE_ANALYSIS_STORE_MB', 512)) * 1024 * 1024
+analyses = LRUBufferCache(ANALYSIS_STORE_BYTES, ttl=ANALYSIS_TTL)
 
 # Allowed file extensions
 ALLOWED_EXTENSIONS = {'wav', 'mp3', 'flac', 'm4a'}
@@ -36,94 +62,243 @@ def analyze_song():
         return jsonify({'error': 'File type not supported'}), 400
     
     try:
-        # Create temporary file
-        temp_id = str(uuid.uuid4())
-        temp_input = f"/tmp/input_{temp_id}.wav"
-        file.save(temp_input)
-        
-        # Analyze the song
-        analysis = generator.analyze_song(temp_input)
+        beat_tracker = parse_beat_tracker(request.form)
+    except ValueError as e:
+        return jsonify({'error': f'Invalid parameter: {e}'}), 400
+    
+    try:
+        # Decode the upload straight from memory
+        analysis = generator.analyze_song(file.stream, beat_tracker=beat_tracker)
         events = generator.schedule_nuances(analysis)
         
-        # Clean up
-        os.remove(temp_input)
+        # Hold on to the decoded song so processing it doesn't need another upload
+        token = f"{analysis['content_hash']}_{beat_tracker}"
+        analyses.put(token, {'analysis': analysis, 'filename': file.filename}, analysis_nbytes(analysis))
         
         return jsonify({
             'success': True,
+            'analysis_token': token,
+            'analysis_expires_in': ANALYSIS_TTL,
             'analysis': {
                 'tempo': float(analysis['tempo']) if hasattr(analysis['tempo'], '__iter__') else analysis['tempo'],
                 'duration': analysis['duration'],
                 'num_beats': len(analysis['beats']),
-                'num_sections': len(analysis['sections'])
+                'num_sections': len(analysis['sections']),
+                'beat_tracker': analysis['beat_tracker']
             },
             'events': len(events),
-            'preview_events': events[:10]  # Show first 10 events
+            'preview_events': events.to_dicts(limit=10)  # Show first 10 events
         })
     
     except Exception as e:
-        # Clean up on error
-        if os.path.exists(temp_input):
-            os.remove(temp_input)
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/process', methods=['POST'])
-def process_song():
-    """Process a song and add nuances with parameters"""
-    if 'file' not in request.files:
-        return jsonify({'error': 'No file provided'}), 400
+def analysis_nbytes(analysis):
+    """Approximate memory held by an analysis (dominated by its arrays)"""
+    return 1024 + sum(value.nbytes for value in analysis.values() if hasattr(value, 'nbytes'))
+
+def parse_beat_tracker(form):
+    """Beat tracking backend named in a submitted form (raises ValueError if unknown or unavailable)"""
+    return get_beat_tracker(form.get('beat_tracker') or DEFAULT_BEAT_TRACKER).name
+
+def parse_render_form(form):
+    """Rendering parameters, seed, output format and beat tracker from a submitted form (raises ValueError)"""
+    params = {}
+    for name in ['creativity_level', 'nuance_density', 'intensity',
+                 'texture_preference', 'randomness', 'stereo_width']:
+        if name in form:
+            params[name] = float(form[name])
+    if 'vintage_mode' in form:
+        params['vintage_mode'] = form['vintage_mode'].lower() == 'true'
+    seed = int(form['seed']) if form.get('seed') else None
+    if seed is not None and seed < 0:
+        raise ValueError("seed must be a non-negative integer")
+    output_format = form.get('format', 'wav').lower()
+    if output_format not in AUDIO_FORMATS:
+        raise ValueError(f"unsupported output format '{output_format}'")
+    return params, seed, output_format, parse_beat_tracker(form)
+
+def render_job(source, output_path, params, seed, output_format, download_name, analysis=None,
+               beat_tracker=None):
+    """Job body: render an uploaded song (held in memory) or a stored analysis to the job's output file"""
+    result = generator.process_song(source, output_path, params, seed=seed,
+                                    output_format=AUDIO_FORMATS[output_format][0], analysis=analysis,
+                                    beat_tracker=beat_tracker)
+    return {
+        'output_path': output_path,
+        'output_format': output_format,
+        'download_name': download_name,
+        'num_events': len(result['events']),
+        'analysis': result['analysis'],
+    }
+
+def render_in_memory(source, params, seed, output_format, download_name, analysis=None, beat_tracker=None):
+    """Job body: render an uploaded song or a stored analysis without writing any files"""
+    audio, sr, gain, nuance_map = generator.render(source, params, seed=seed, analysis=analysis,
+                                                   beat_tracker=beat_tracker)
+    return {
+        'audio': audio,
+        'sr': sr,
+        'gain': gain,
+        'output_format': output_format,
+        'download_name': download_name,
+        'num_events': len(nuance_map['events']),
+        'analysis': nuance_map['analysis'],
+    }
+
+def submit_render_job(render_fn=render_job):
+    """Validate the request and queue its render; returns (job, None) or (None, error response)
     
-    file = request.files['file']
-    if file.filename == '':
-        return jsonify({'error': 'No file selected'}), 400
+    The song is either uploaded as `file` or referenced by the `analysis_token`
+    that /api/analyze returned for it.
+    """
+    token = request.form.get('analysis_token')
+    if token:
+        stored = analyses.get(token)
+        if stored is None:
+            return None, (jsonify({'error': 'Analysis expired, please upload the song again',
+                                   'code': 'analysis_expired'}), 410)
+        filename = stored['filename']
+        analysis = stored['analysis']
+    else:
+        if 'file' not in request.files:
+            return None, (jsonify({'error': 'No file provided'}), 400)
+        
+        file = request.files['file']
+        if file.filename == '':
+            return None, (jsonify({'error': 'No file selected'}), 400)
+        
+        if not allowed_file(file.filename):
+            return None, (jsonify({'error': 'File type not supported'}), 400)
+        filename = file.filename
+        analysis = None
     
-    if not allowed_file(file.filename):
-        return jsonify({'error': 'File type not supported'}), 400
+    try:
+        params, seed, output_format, beat_tracker = parse_render_form(request.form)
+    except ValueError as e:
+        return None, (jsonify({'error': f'Invalid parameter: {e}'}), 400)
+    if analysis is not None:
+        # The token's analysis was made with a fixed beat tracker
+        if request.form.get('beat_tracker') and beat_tracker != analysis['beat_tracker']:
+            return None, (jsonify({'error': f"Invalid parameter: beat_tracker '{beat_tracker}' does not match "
+                                            f"the analysis token's '{analysis['beat_tracker']}'"}), 400)
+        beat_tracker = analysis['beat_tracker']
     
     try:
-        # Get parameters from form data
-        params = {}
-        if 'creativity_level' in request.form:
-            params['creativity_level'] = float(request.form['creativity_level'])
-        if 'nuance_density' in request.form:
-            params['nuance_density'] = float(request.form['nuance_density'])
-        if 'intensity' in request.form:
-            params['intensity'] = float(request.form['intensity'])
-        if 'texture_preference' in request.form:
-            params['texture_preference'] = float(request.form['texture_preference'])
-        if 'randomness' in request.form:
-            params['randomness'] = float(request.form['randomness'])
-        if 'stereo_width' in request.form:
-            params['stereo_width'] = float(request.form['stereo_width'])
-        if 'vintage_mode' in request.form:
-            params['vintage_mode'] = request.form['vintage_mode'].lower() == 'true'
-        
-        # Create temporary files
-        temp_id = str(uuid.uuid4())
-        temp_input = f"/tmp/input_{temp_id}.wav"
-        temp_output = f"/tmp/output_{temp_id}.wav"
-        
-        file.save(temp_input)
-        
-        # Process the song with parameters
-        result = generator.process_song(temp_input, temp_output, params)
-        
-        # Clean up input
-        os.remove(temp_input)
-        
-        # Return the processed file
-        return send_file(
-            temp_output, 
-            as_attachment=True,
-            download_name=f"enhanced_{secure_filename(file.filename)}",
-            mimetype='audio/wav'
-        )
+        job = jobs.create()
+    except QueueFull:
+        response = jsonify({'error': 'Too many songs are waiting to be processed, try again shortly'})
+        response.headers['Retry-After'] = '30'
+        return None, (response, 503)
     
-    except Exception as e:
-        # Clean up on error
-        for temp_file in [temp_input, temp_output]:
-            if os.path.exists(temp_file):
-                os.remove(temp_file)
-        return jsonify({'error': str(e)}), 500
+    # A created job counts against the queue until it finishes, so one that
+    # never gets submitted must not be left behind
+    try:
+        if analysis is not None:
+            # The stored analysis already holds the decoded song; the name is just for the map
+            source = filename
+        else:
+            # The upload is already in memory and is decoded from there by the job (from
+            # a copy, since the request closes its own stream when it ends)
+            source = io.BytesIO(file.stream.getvalue())
+        download_name = f"enhanced_{secure_filename(filename).rsplit('.', 1)[0]}.{output_format}"
+        if render_fn is render_job:
+            output_path = str(job['dir'] / f"output.{output_format}")
+            jobs.submit(job['id'], render_job, source, output_path, params, seed, output_format,
+                        download_name, analysis, beat_tracker)
+        else:
+            jobs.submit(job['id'], render_fn, source, params, seed, output_format, download_name, analysis,
+                        beat_tracker)
+    except BaseException:
+        jobs.discard(job['id'])
+        raise
+    return job, None
+
+def job_status(job):
+    """Public view of a job's status"""
+    status = {
+        'job_id': job['id'],
+        'status': job['status'],
+        'created': job['created'],
+        'started': job['started'],
+        'finished': job['finished'],
+    }
+    if job['status'] == 'queued':
+        status['position'] = job['position']
+    elif job['status'] == 'error':
+        status['error'] = job['error']
+    elif job['status'] == 'done':
+        status['num_events'] = job['result']['num_events']
+        status['analysis'] = job['result']['analysis']
+        status['result_url'] = url_for('job_result', job_id=job['id'])
+        status['expires'] = job['finished'] + JOB_TTL
+    return status
+
+@app.route('/api/jobs', methods=['POST'])
+def create_job():
+    """Queue a song for processing; poll the returned status URL for progress"""
+    job, error = submit_render_job()
+    if error:
+        return error
+    return jsonify({
+        'job_id': job['id'],
+        'status': 'queued',
+        'status_url': url_for('get_job', job_id=job['id']),
+        'result_url': url_for('job_result', job_id=job['id'])
+    }), 202
+
+@app.route('/api/jobs/<job_id>')
+def get_job(job_id):
+    """Status of a processing job: queued, running, done or error"""
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown or expired job'}), 404
+    return jsonify(job_status(job))
+
+@app.route('/api/jobs/<job_id>/result')
+def job_result(job_id):
+    """Download the enhanced song of a finished job"""
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown or expired job'}), 404
+    if job['status'] != 'done':
+        return jsonify(job_status(job)), 409
+    return send_file(
+        job['result']['output_path'],
+        as_attachment=True,
+        download_name=job['result']['download_name'],
+        mimetype=AUDIO_FORMATS[job['result']['output_format']][1]
+    )
+
+@app.route('/api/process', methods=['POST'])
+def process_song():
+    """Process a song and add nuances with parameters, streaming the result back
+    
+    Runs through the job queue like /api/jobs, so it shares the worker bound,
+    but renders in memory and encodes the response chunk by chunk as it is
+    sent, without touching the disk.
+    """
+    job, error = submit_render_job(render_in_memory)
+    if error:
+        return error
+    
+    finished = jobs.wait(job['id'])
+    jobs.discard(job['id'])  # The result is handed to this response only
+    if finished is None:
+        return jsonify({'error': 'Job expired'}), 500
+    if finished['status'] == 'error':
+        return jsonify({'error': finished['error']}), 500
+    
+    result = finished['result']
+    output_format = result['output_format']
+    headers = {'Content-Disposition': f"attachment; filename={result['download_name']}"}
+    if output_format == 'wav':
+        headers['Content-Length'] = str(wav_size(result['audio']))
+    return Response(
+        encode_chunks(result['audio'], result['sr'], result['gain'], output_format),
+        mimetype=AUDIO_FORMATS[output_format][1],
+        headers=headers
+    )
 
 @app.route('/api/status')
 def status():
@@ -132,7 +307,11 @@ def status():
     return jsonify({
         'status': 'ready',
         'samples_loaded': sample_counts,
-        'total_samples': sum(sample_counts.values())
+        'total_samples': sum(sample_counts.values()),
+        'sample_pool': generator.catalog.pool_stats(),
+        'beat_trackers': available_beat_trackers(),
+        'jobs': jobs.stats(),
+        'analyses': analyses.stats()
     })
 
 if __name__ == '__main__':
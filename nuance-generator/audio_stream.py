@@ -0,0 +1,150 @@
+"""
+Chunked encoding of rendered audio for streamed HTTP responses
+
+Rendered songs are encoded block by block as they are sent, so a response
+never needs the whole encoded file on disk. WAV is written with a
+precomputed header followed by 16-bit PCM converted per block; FLAC frames are
+sent as libsndfile produces them, with the sample count written into the
+header up front (the encoder would only fill it in when it finishes).
+"""
+
+import io
+import struct
+from typing import Iterator
+
+import numpy as np
+import soundfile as sf
+
+# Output formats: name -> (soundfile format, MIME type)
+AUDIO_FORMATS = {
+    'wav': ('WAV', 'audio/wav'),
+    'flac': ('FLAC', 'audio/flac'),
+}
+
+
+def wav_header(frames: int, channels: int, sr: int, sample_width: int = 2) -> bytes:
+    """44-byte RIFF header of a PCM WAV file with the given number of frames"""
+    block_align = channels * sample_width
+    data_size = frames * block_align
+    return struct.pack('<4sI4s4sIHHIIHH4sI',
+                       b'RIFF', 36 + data_size, b'WAVE',
+                       b'fmt ', 16, 1, channels, sr, sr * block_align, block_align, sample_width * 8,
+                       b'data', data_size)
+
+
+def wav_size(audio: np.ndarray) -> int:
+    """Encoded size in bytes of audio as 16-bit WAV (for Content-Length)"""
+    channels = 1 if audio.ndim == 1 else audio.shape[0]
+    return 44 + audio.shape[-1] * channels * 2
+
+
+def pcm16_bytes(block: np.ndarray, sr: int) -> bytes:
+    """Interleaved little-endian 16-bit PCM of a float block
+    
+    Converted by libsndfile as headerless RAW, so the samples match a WAV
+    file written with soundfile bit for bit.
+    """
+    raw = io.BytesIO()
+    sf.write(raw, block if block.ndim == 1 else block.T, sr, subtype='PCM_16',
+             endian='LITTLE', format='RAW')
+    return raw.getvalue()
+
+
+def encode_chunks(audio: np.ndarray, sr: int, gain: float = 1.0, audio_format: str = 'wav',
+                  block_size: int = 65536) -> Iterator[bytes]:
+    """Encode (channels, samples) or mono float audio, scaled by gain, as a stream of byte chunks"""
+    channels = 1 if audio.ndim == 1 else audio.shape[0]
+    gain = audio.dtype.type(gain)
+
+    def blocks():
+        for start in range(0, audio.shape[-1], block_size):
+            block = audio[..., start:start + block_size]
+            yield block * gain if gain != 1.0 else block
+
+    if audio_format == 'wav':
+        yield wav_header(audio.shape[-1], channels, sr)
+        for block in blocks():
+            yield pcm16_bytes(block, sr)
+        return
+
+    sink = _StreamSink()
+
+    def drain():
+        first = sink.sent == 0
+        chunk = sink.drain()
+        return _flac_total_samples(chunk, audio.shape[-1]) if first else chunk
+
+    with sf.SoundFile(sink, 'w', sr, channels, format=AUDIO_FORMATS[audio_format][0],
+                      subtype='PCM_16') as output:
+        for block in blocks():
+            output.write(block if block.ndim == 1 else block.T)
+            if sink.sent or len(sink.pending) >= FLAC_HEADER_SIZE:
+                yield drain()
+    # Closing flushes the last frames (and rewrites the header, which the sink drops)
+    chunk = drain()
+    if chunk:
+        yield chunk
+
+
+# "fLaC" marker, metadata block header and STREAMINFO block
+FLAC_HEADER_SIZE = 42
+
+
+def _flac_total_samples(chunk: bytes, frames: int) -> bytes:
+    """Write the number of frames into the STREAMINFO at the start of a FLAC stream
+    
+    The MD5 signature and frame size bounds stay zero ("unknown"), which
+    decoders accept.
+    """
+    if len(chunk) < FLAC_HEADER_SIZE or not chunk.startswith(b'fLaC'):
+        return chunk
+    header = bytearray(chunk)
+    header[21] = (header[21] & 0xF0) | ((frames >> 32) & 0x0F)
+    header[22:26] = (frames & 0xFFFFFFFF).to_bytes(4, 'big')
+    return bytes(header)
+
+
+class _StreamSink:
+    """Write-only file object handing the encoder's output out as it is written
+    
+    Seeking back into bytes that were already sent is allowed, but writes
+    there are dropped: that is only the encoder patching its header on close.
+    """
+
+    def __init__(self):
+        self.pending = bytearray()
+        self.sent = 0
+        self.position = 0
+
+    def size(self) -> int:
+        return self.sent + len(self.pending)
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        start = self.position - self.sent
+        if start < 0:
+            kept = data[-start:]
+            start = 0
+        else:
+            kept = data
+        self.pending[start:start + len(kept)] = kept
+        self.position += len(data)
+        return len(data)
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self.position, io.SEEK_END: self.size()}[whence]
+        self.position = base + offset
+        return self.position
+
+    def tell(self) -> int:
+        return self.position
+
+    def read(self, size: int = -1) -> bytes:
+        return b''
+
+    def drain(self) -> bytes:
+        """Bytes written since the last drain"""
+        chunk = bytes(self.pending)
+        self.sent += len(chunk)
+        self.pending.clear()
+        return chunk
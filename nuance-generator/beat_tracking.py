@@ -0,0 +1,221 @@
+"""
+Pluggable beat and downbeat trackers
+
+Every backend turns a song's SongFeatures (and, for backends that listen to
+the full band, its mono audio at the decoded rate) into a tempo (BPM), beat
+times and downbeat times (seconds):
+
+  librosa  dynamic-programming beat tracker on the shared onset envelope (default)
+  madmom   RNN + DBN downbeat tracker, the most accurate (requires madmom)
+  preview  global onset autocorrelation and a fixed beat grid, for interactive previews
+
+Backends are looked up by name with get_beat_tracker(); the name is part of
+the analysis cache key, since different trackers give different beat grids.
+"""
+
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import librosa
+import numpy as np
+
+from analysis_engine import SongFeatures
+
+DEFAULT_BEAT_TRACKER = 'librosa'
+
+# Tempo, beat times and downbeat times
+BeatGrid = Tuple[float, np.ndarray, np.ndarray]
+
+
+def harmonic_downbeats(features: SongFeatures, beats: np.ndarray, beats_per_bar: int = 4) -> np.ndarray:
+    """Every `beats_per_bar`th beat, starting where new harmony enters most
+
+    Chords tend to change on the downbeat, so beat one is taken as the bar
+    phase with the largest rise in loudness-weighted chroma over the previous
+    beat (a rise only: chords stopping before the bar line don't count).
+    """
+    if len(beats) < 2 * beats_per_bar:
+        return beats[::beats_per_bar]
+    chroma = features.beat_sync(features.chroma * features.frame_level, beats)
+    rise = np.zeros(len(beats))
+    rise[1:] = np.maximum(chroma[:, 1:] - chroma[:, :-1], 0).sum(axis=0)
+    phase = int(np.argmax([rise[offset::beats_per_bar].mean() for offset in range(beats_per_bar)]))
+    return beats[phase::beats_per_bar]
+
+
+def bar_positions(beats: np.ndarray, downbeats: Optional[np.ndarray] = None,
+                  beats_per_bar: int = 4) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Bar number, position in the bar and bar length (in beats) of every beat
+
+    Bars start at the beats nearest the downbeats, so 3/4 bars and odd bars
+    from the tracker are followed; beats before the first downbeat form pickup
+    bars counted back from it. Without downbeats, a bar is every
+    `beats_per_bar` beats from the first.
+    """
+    beats = np.asarray(beats, dtype=np.float64)
+    num_beats = len(beats)
+    if num_beats > 1 and downbeats is not None and len(downbeats) > 0:
+        downbeats = np.asarray(downbeats, dtype=np.float64)
+        index = np.clip(np.searchsorted(beats, downbeats), 1, num_beats - 1)
+        index -= (downbeats - beats[index - 1]) < (beats[index] - downbeats)
+        starts = np.unique(index)
+    else:
+        starts = np.arange(0, max(num_beats, 1), beats_per_bar)
+    length = int(starts[1] - starts[0]) if len(starts) > 1 else beats_per_bar
+    if starts[0] > 0:
+        pickup = np.arange(starts[0] - length * int(np.ceil(starts[0] / length)), starts[0], length)
+        starts = np.concatenate([pickup, starts])
+    last_length = starts[-1] - starts[-2] if len(starts) > 1 else beats_per_bar
+    lengths = np.diff(np.append(starts, starts[-1] + last_length))
+    beat_index = np.arange(num_beats)
+    bar = np.searchsorted(starts, beat_index, side='right') - 1
+    return bar, beat_index - starts[bar], lengths[bar]
+
+
+class BeatTracker:
+    """Interface of a beat tracking backend"""
+
+    name = ''
+    audio_sr: Optional[int] = None  # Rate the backend wants `audio` at (None: features only)
+
+    def track(self, features: SongFeatures, audio: Optional[np.ndarray] = None,
+              sr: Optional[int] = None) -> BeatGrid:
+        """Tempo (BPM), beat times and downbeat times (seconds) of a song
+
+        `audio` is the song's mono fold-down at its decoded rate `sr`; backends
+        that only need the shared features ignore it.
+        """
+        raise NotImplementedError
+
+
+class LibrosaBeatTracker(BeatTracker):
+    """librosa's dynamic-programming tracker; downbeats from harmonic changes"""
+
+    name = 'librosa'
+
+    def track(self, features: SongFeatures, audio: Optional[np.ndarray] = None,
+              sr: Optional[int] = None) -> BeatGrid:
+        tempo, beats = features.beat_track()
+        return tempo, beats, harmonic_downbeats(features, beats)
+
+
+class MadmomBeatTracker(BeatTracker):
+    """madmom's RNN downbeat activations decoded by its DBN bar tracker (3/4 or 4/4)"""
+
+    name = 'madmom'
+    SR = 44100  # The networks were trained on 44.1 kHz audio
+    audio_sr = SR
+
+    def __init__(self):
+        try:
+            from madmom.audio.signal import Signal
+            from madmom.features.downbeats import DBNDownBeatTrackingProcessor, RNNDownBeatProcessor
+        except ImportError as e:
+            raise ValueError(f"beat tracker 'madmom' needs madmom installed ({e})") from e
+        self._signal = Signal
+        self._activations = RNNDownBeatProcessor()
+        self._decode = DBNDownBeatTrackingProcessor(beats_per_bar=[3, 4], fps=100)
+
+    def track(self, features: SongFeatures, audio: Optional[np.ndarray] = None,
+              sr: Optional[int] = None) -> BeatGrid:
+        # The networks listen to the full band, so start from the decoded audio
+        # rather than the decimated analysis signal when it is given
+        if audio is None:
+            audio, sr = features.y, features.sr
+        y = audio if sr == self.SR else librosa.resample(audio, orig_sr=sr, target_sr=self.SR)
+        grid = self._decode(self._activations(self._signal(y, sample_rate=self.SR, num_channels=1)))
+        if len(grid) == 0:
+            return 0.0, np.zeros(0), np.zeros(0)
+        beats = grid[:, 0]
+        tempo = 60.0 / np.median(np.diff(beats)) if len(beats) > 1 else 0.0
+        return float(tempo), beats, beats[grid[:, 1] == 1]
+
+
+class PreviewBeatTracker(BeatTracker):
+    """Fixed-tempo beat grid from the onset envelope's autocorrelation
+
+    The beat period is the autocorrelation peak under a log-normal prior
+    around 120 BPM, refined to a fraction of a frame from the peak several
+    beats later, and the grid starts at the phase that collects the most
+    onset strength, each onset weighted by how loud the song is just after
+    it (so note starts win over the clicks of notes stopping). Costs one FFT
+    of the onset envelope plus a linear scan, at the price of not following
+    tempo changes.
+    """
+
+    name = 'preview'
+    MIN_BPM = 60
+    MAX_BPM = 200
+    REFINE_BEATS = 8  # The period is measured over this many beats
+
+    def track(self, features: SongFeatures, audio: Optional[np.ndarray] = None,
+              sr: Optional[int] = None) -> BeatGrid:
+        envelope = features.onset_envelope
+        fps = features.sr / features.hop_length
+        min_lag = int(fps * 60 / self.MAX_BPM)
+        max_lag = int(np.ceil(fps * 60 / self.MIN_BPM))
+        if len(envelope) <= 2 * max_lag:
+            return 0.0, np.zeros(0), np.zeros(0)
+
+        centered = envelope - envelope.mean()
+        spectrum = np.fft.rfft(centered, 2 * len(centered))
+        autocorrelation = np.fft.irfft(np.abs(spectrum) ** 2)[:len(envelope)]
+        # Periods between two frame lags split their peak, so compare 3-lag sums
+        smoothed = np.convolve(autocorrelation[:max_lag + 2], np.ones(3), 'same')
+        lags = np.arange(min_lag, max_lag + 1)
+        prior = np.exp(-0.5 * np.log2(fps * 60 / lags / 120) ** 2)
+        period = float(lags[np.argmax(smoothed[lags] * prior)])
+
+        # The peak `beats` periods later, with parabolic interpolation, gives the
+        # period to a small fraction of a frame
+        beats = max(1, min(self.REFINE_BEATS, int(len(envelope) / (2 * period))))
+        low = max(1, int(beats * (period - 1)))
+        high = min(len(autocorrelation) - 2, int(np.ceil(beats * (period + 1))))
+        peak = low + int(np.argmax(autocorrelation[low:high + 1]))
+        left, mid, right = autocorrelation[peak - 1:peak + 2]
+        curvature = left - 2 * mid + right
+        period = (peak + (0.5 * (left - right) / curvature if curvature < 0 else 0.0)) / beats
+
+        # Phase: the grid offset (in frames) with the largest total onset strength,
+        # weighting onsets by the level of the two frames after them
+        level = np.pad(features.frame_level, (0, 2), mode='edge')
+        following = 0.5 * (level[1:len(envelope) + 1] + level[2:len(envelope) + 2])
+        strength = envelope * following / max(following.max(), 1e-9)
+        grid = np.arange(0, len(envelope) - period, period)
+        offsets = np.arange(int(np.ceil(period)))
+        frames = np.minimum(np.round(offsets[:, None] + grid[None, :]).astype(int), len(envelope) - 1)
+        grid = grid + offsets[np.argmax(strength[frames].sum(axis=1))]
+        beat_times = features.frame_times(grid[grid < len(envelope)])
+        return float(fps * 60 / period), beat_times, harmonic_downbeats(features, beat_times)
+
+
+BEAT_TRACKERS = {
+    'librosa': LibrosaBeatTracker,
+    'madmom': MadmomBeatTracker,
+    'preview': PreviewBeatTracker,
+}
+
+_trackers: Dict[str, BeatTracker] = {}
+_trackers_lock = threading.Lock()
+
+
+def get_beat_tracker(name: str) -> BeatTracker:
+    """The (shared) tracker of a backend; ValueError if unknown or not installed"""
+    if name not in BEAT_TRACKERS:
+        raise ValueError(f"unknown beat tracker '{name}' (choose from {', '.join(BEAT_TRACKERS)})")
+    with _trackers_lock:
+        if name not in _trackers:
+            _trackers[name] = BEAT_TRACKERS[name]()
+        return _trackers[name]
+
+
+def available_beat_trackers() -> List[str]:
+    """Names of the backends that can run here"""
+    available = []
+    for name in BEAT_TRACKERS:
+        try:
+            get_beat_tracker(name)
+        except ValueError:
+            continue
+        available.append(name)
+    return available
@@ -0,0 +1,552 @@
+#!/usr/bin/env python3
+"""
+Benchmark harness for the AI Song Nuance Generator
+
+Suites (all run with fixed seeds):
+  legacy      effects against their original per-sample loops (with a tolerance check)
+  effects     every _apply_* effect at several sample lengths
+  generators  every generate_* method of AINoiseGenerator
+  stages      analyze_song, schedule_nuances and apply_nuances separately
+  beats       speed and accuracy of every installed beat tracking backend
+  e2e         full process_song on synthetic songs (30 s, 5 min and 60 min by default)
+  dtype       synthesis and mixing under the float64 and float32 dtype policies
+
+Usage:
+  python benchmark.py --json baseline.json                     # run everything, save results
+  python benchmark.py --suite effects stages --baseline baseline.json
+  python benchmark.py --suite e2e --durations 30 300 --json now.json --baseline baseline.json
+
+With --baseline, timings more than --threshold slower than the baseline are
+reported as regressions and the exit status is 1.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import librosa
+import numpy as np
+import soundfile as sf
+from analysis_engine import SongFeatures
+from beat_tracking import BEAT_TRACKERS, available_beat_trackers, get_beat_tracker
+from nuance_generator import AINoiseGenerator, SongNuanceGenerator
+from test_generator import generate_test_song
+
+SR = 44100
+
+# Longest sample each generate_ai_sample() branch can produce (seconds)
+SAMPLE_DURATIONS = {
+    'click': 0.15,
+    'glitch': 0.4,
+    'hit': 0.8,
+    'vocal_chop': 0.8,
+    'riser': 2.5,
+    'crash': 3.0,
+    'texture': 3.0,
+}
+
+# Original per-sample loop implementations, kept here as the "before" reference
+
+def legacy_chorus(audio, sr=SR):
+    delay_samples = random.randint(int(0.01 * sr), int(0.03 * sr))
+    depth = random.uniform(0.3, 0.8)
+    rate = random.uniform(1, 5)
+    t = np.linspace(0, len(audio) / sr, len(audio))
+    modulation = depth * np.sin(2 * np.pi * rate * t)
+    delayed = np.zeros_like(audio)
+    for i in range(len(audio)):
+        delay_offset = int(delay_samples + modulation[i] * delay_samples * 0.5)
+        if i - delay_offset >= 0:
+            delayed[i] = audio[i - delay_offset]
+    return 0.7 * audio + 0.3 * delayed
+
+def legacy_flanger(audio, sr=SR):
+    rate = random.uniform(0.2, 2.0)
+    depth = random.uniform(0.001, 0.01)
+    feedback = random.uniform(0.2, 0.7)
+    t = np.linspace(0, len(audio) / sr, len(audio))
+    delay_mod = depth * (1 + np.sin(2 * np.pi * rate * t)) / 2
+    flanged = audio.copy()
+    for i in range(len(audio)):
+        delay_samples = int(delay_mod[i] * sr)
+        if i - delay_samples >= 0:
+            flanged[i] += feedback * audio[i - delay_samples]
+    return flanged
+
+def legacy_delay(audio, sr=SR):
+    delay_time = random.uniform(0.1, 0.4)
+    feedback = random.uniform(0.2, 0.6)
+    mix = random.uniform(0.2, 0.5)
+    delay_samples = int(delay_time * sr)
+    delayed = np.zeros(len(audio) + delay_samples)
+    delayed[:len(audio)] = audio
+    for i in range(delay_samples, len(delayed)):
+        if i - delay_samples < len(audio):
+            delayed[i] += feedback * delayed[i - delay_samples]
+    output = np.zeros_like(audio)
+    for i in range(len(audio)):
+        output[i] = (1 - mix) * audio[i] + mix * delayed[i + delay_samples]
+    return output
+
+def legacy_filter_sweep(audio, sr=SR):
+    start_freq = random.uniform(200, 1000)
+    end_freq = random.uniform(2000, 8000)
+    t = np.linspace(0, len(audio) / sr, len(audio))
+    cutoff_freq = start_freq * (end_freq / start_freq) ** (t / t[-1])
+    filtered = audio.copy()
+    for i in range(1, len(audio)):
+        alpha = min(0.5, cutoff_freq[i] / (sr / 2))
+        filtered[i] = alpha * audio[i] + (1 - alpha) * filtered[i-1]
+    return filtered
+
+def legacy_subtle_filter(audio, sr=SR):
+    cutoff = random.uniform(3000, 8000)
+    alpha = 2 * np.pi * cutoff / sr
+    alpha = alpha / (1 + alpha)
+    filtered = np.zeros_like(audio)
+    filtered[0] = audio[0]
+    for i in range(1, len(audio)):
+        filtered[i] = alpha * audio[i] + (1 - alpha) * filtered[i-1]
+    return filtered
+
+def test_signal(duration):
+    """Band-limited test tone so interpolation differences stay meaningful"""
+    t = np.arange(int(SR * duration)) / SR
+    return 0.3 * np.sin(2 * np.pi * 220 * t) + 0.1 * np.sin(2 * np.pi * 660 * t)
+
+def time_call(func, audio, rngs=(random,), repeats=3, seed=0):
+    """Return (best wall time, output) of func(audio) with the given RNGs reseeded"""
+    best = float('inf')
+    output = None
+    for _ in range(repeats):
+        for rng in rngs:
+            rng.seed(seed)
+        start = time.perf_counter()
+        output = func(audio)
+        best = min(best, time.perf_counter() - start)
+    return best, output
+
+def benchmark_effects(results, workdir):
+    """Compare legacy and current effects on every sample length
+
+    The tolerance column is the largest allowed deviation from the legacy
+    loop relative to the signal peak; chorus and flanger now interpolate
+    fractional delays, so their difference is reported but not checked.
+    """
+    generator = AINoiseGenerator()
+    with quiet():
+        song_generator = SongNuanceGenerator(os.path.join(workdir, 'samples'), analysis_cache_dir=None)
+    effects = [
+        ('chorus', legacy_chorus, generator._apply_chorus, None),
+        ('flanger', legacy_flanger, generator._apply_flanger, None),
+        ('delay', legacy_delay, generator._apply_delay, 1e-9),
+        ('sweep', legacy_filter_sweep, generator._apply_filter_sweep, 1e-9),
+        ('subtle_lp', legacy_subtle_filter,
+         lambda audio: song_generator._apply_subtle_filter(audio, SR), 1e-9),
+    ]
+
+    failures = []
+    print(f"{'effect':<10}{'sample':<12}{'length':>8}{'before ms':>12}{'after ms':>12}{'speedup':>10}{'max diff':>10}")
+    for name, before, after, tolerance in effects:
+        for sample_name, duration in SAMPLE_DURATIONS.items():
+            audio = test_signal(duration)
+            before_time, before_out = time_call(before, audio)
+            after_time, after_out = time_call(after, audio, rngs=(random, generator.rng))
+            max_diff = np.max(np.abs(before_out - after_out)) / np.max(np.abs(before_out))
+            print(f"{name:<10}{sample_name:<12}{duration:>7.2f}s"
+                  f"{before_time * 1000:>12.2f}{after_time * 1000:>12.2f}"
+                  f"{before_time / after_time:>9.1f}x{max_diff:>10.1e}")
+            results[f"legacy/{name}/{sample_name}"] = {'best': after_time, 'loop': before_time, 'runs': 3}
+            if tolerance is not None and max_diff > tolerance:
+                failures.append(f"{name} on {sample_name}: {max_diff:.1e} > {tolerance:.0e}")
+
+    song_generator.close()
+    for failure in failures:
+        print(f"❌ Outside tolerance: {failure}")
+    return not failures
+
+def measure(func, repeats=3):
+    """Return (best wall time, peak traced allocation in bytes, output) of func()"""
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        output = func()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak, output
+
+def benchmark_dtypes(results, workdir, samples_per_category=8, song_duration=60.0):
+    """Throughput and memory of synthesis and mixing under each dtype policy
+
+    Rate is samples synthesized per second for synthesis and times realtime
+    for mixing; peak MB is the largest traced allocation during one run.
+    """
+    categories = ['percussion', 'texture', 'riser', 'fx']
+    beats = np.arange(0.5, song_duration, 0.5)
+    song = test_signal(song_duration)
+    samples_dir = os.path.join(workdir, 'samples')
+
+    rows = []
+    for dtype in (np.float64, np.float32):
+        def synthesize():
+            return [AINoiseGenerator(seed, dtype).generate_sample(category)['audio']
+                    for category in categories for seed in range(samples_per_category)]
+        seconds, peak, samples = measure(synthesize)
+        rows.append((dtype, 'synthesis', seconds, len(samples) / seconds, peak,
+                     sum(audio.nbytes for audio in samples)))
+
+        # Mix a dense schedule into a stereo song; seeded samples are synthesized
+        # on the first run and served from the cache after that
+        song_generator = SongNuanceGenerator(samples_dir, analysis_cache_dir=None, dtype=dtype)
+        analysis = {'sr': SR, 'channels': 2, 'tempo': 120.0, 'beats': beats, 'sections': [],
+                    'audio': np.stack([song, song]).astype(dtype)}
+        params = {**song_generator.default_params, 'nuance_density': 3.0}
+        events = song_generator.schedule_nuances(analysis, params, seed=0)
+        seconds, peak, mixed = measure(lambda: song_generator.apply_nuances(analysis, events, params,
+                                                                            use_pool=False))
+        rows.append((dtype, 'mix', seconds, song_duration / seconds, peak, mixed.nbytes))
+        song_generator.close()
+
+    print(f"\n{'dtype':<10}{'stage':<12}{'time ms':>10}{'rate':>10}{'peak MB':>10}{'output MB':>11}")
+    for dtype, stage, seconds, rate, peak, nbytes in rows:
+        print(f"{np.dtype(dtype).name:<10}{stage:<12}{seconds * 1000:>10.1f}{rate:>10.1f}"
+              f"{peak / 2**20:>10.1f}{nbytes / 2**20:>11.1f}")
+        results[f"dtype/{np.dtype(dtype).name}/{stage}"] = {'best': seconds, 'peak_bytes': peak, 'runs': 3}
+
+# Harness for the effect, generator, stage and end-to-end suites
+
+# Sample lengths (seconds) each effect is timed at
+EFFECT_LENGTHS = (0.15, 0.8, 3.0, 10.0)
+
+# Longer test songs tile a render of this length: 30 full four-chord cycles
+# (120 bars) at 120 BPM, so the tiled song has no seams in its pattern
+TILE_SECONDS = 240
+
+# Songs longer than this are processed with streaming=True, as the CLI's
+# --stream does for hour-long mixes
+STREAM_ABOVE = 600
+
+@contextlib.contextmanager
+def quiet():
+    """Silence the generator's progress output while timing"""
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+def reseed(generator, seed=0):
+    """Reset an AINoiseGenerator's private RNG streams"""
+    generator.rng.seed(seed)
+    generator.np_rng = np.random.default_rng(seed)
+
+def run_timed(func, repeats=3, setup=None, seed=0):
+    """Time func() with the global RNGs reseeded before every run
+
+    `setup` runs untimed before each run (e.g. to clear caches). Returns the
+    timing record (best and median wall time) and the last output.
+    """
+    times = []
+    output = None
+    for _ in range(repeats):
+        random.seed(seed)
+        np.random.seed(seed)
+        with quiet():
+            if setup is not None:
+                setup()
+            start = time.perf_counter()
+            output = func()
+            times.append(time.perf_counter() - start)
+    return {'best': min(times), 'median': float(np.median(times)), 'runs': repeats}, output
+
+def record(results, name, timing, **extra):
+    results[name] = {**timing, **extra}
+    details = ''.join(f"  {key}={value:.4g}" if isinstance(value, float) else f"  {key}={value}"
+                      for key, value in extra.items())
+    print(f"{name:<44}{timing['best'] * 1000:>12.2f}{timing['median'] * 1000:>12.2f}{details}")
+
+def print_header():
+    print(f"{'benchmark':<44}{'best ms':>12}{'median ms':>12}")
+
+def benchmark_effect_bank(results, repeats=3):
+    """Every _apply_* effect of AINoiseGenerator at several sample lengths"""
+    generator = AINoiseGenerator(seed=0)
+    for effect in generator.effect_bank:
+        apply = getattr(generator, f"_apply_{effect}")
+        for duration in EFFECT_LENGTHS:
+            audio = test_signal(duration).astype(generator.dtype)
+            timing, _ = run_timed(lambda: apply(audio), repeats, setup=lambda: reseed(generator))
+            record(results, f"effects/{effect}/{duration:g}s", timing)
+
+def benchmark_generators(results, repeats=3):
+    """Every generate_* method of AINoiseGenerator"""
+    generator = AINoiseGenerator(seed=0)
+    cases = [
+        ('texture_pad', lambda: generator.generate_texture_pad(2.0, 220.0)),
+        ('percussive_hit/crash', lambda: generator.generate_percussive_hit('crash')),
+        ('percussive_hit/click', lambda: generator.generate_percussive_hit('click')),
+        ('percussive_hit/hit', lambda: generator.generate_percussive_hit('hit')),
+        ('riser', lambda: generator.generate_riser(2.0)),
+        ('vocal_chop', generator.generate_vocal_chop),
+        ('glitch', generator.generate_glitch),
+    ]
+    cases += [(f"sample/{category}", lambda category=category: generator.generate_sample(category))
+              for category in ['percussion', 'texture', 'riser', 'fx']]
+    for name, generate in cases:
+        timing, _ = run_timed(generate, repeats, setup=lambda: reseed(generator))
+        record(results, f"generators/{name}", timing)
+
+def make_test_song(directory, duration, bpm=120):
+    """Seeded generate_test_song() output of any length
+
+    Songs longer than TILE_SECONDS repeat a render of that length block by
+    block, so an hour-long song is never built in memory.
+    """
+    path = os.path.join(directory, f"song_{duration:g}s_{bpm:g}bpm.wav")
+    np.random.seed(0)
+    with quiet():
+        if duration <= TILE_SECONDS:
+            return generate_test_song(duration, bpm, path)
+        tile_path = generate_test_song(TILE_SECONDS, bpm, os.path.join(directory, 'tile.wav'))
+    tile, sr = sf.read(tile_path, dtype='float32')
+    remaining = int(duration * sr)
+    with sf.SoundFile(path, 'w', sr, 1) as out:
+        while remaining > 0:
+            out.write(tile[:remaining])
+            remaining -= len(tile)
+    os.remove(tile_path)
+    return path
+
+def warm_up(workdir):
+    """Analyze a short song once, untimed: librosa compiles its numba kernels on first use"""
+    song_path = make_test_song(workdir, 5)
+    with quiet():
+        generator = SongNuanceGenerator(os.path.join(workdir, 'samples'), analysis_cache_dir=None)
+        generator.analyze_song(song_path)
+        generator.close()
+    os.remove(song_path)
+
+def benchmark_stages(results, workdir, duration=30.0, repeats=3):
+    """analyze_song, schedule_nuances and apply_nuances on their own
+
+    Caches are cleared before each timed run; apply_nuances is also timed
+    warm (seeded samples already synthesized), as when re-rendering a song.
+    """
+    song_path = make_test_song(workdir, duration)
+    with quiet():
+        generator = SongNuanceGenerator(os.path.join(workdir, 'samples'), analysis_cache_dir=None)
+    catalog = generator.catalog
+    label = f"{duration:g}s"
+
+    timing, analysis = run_timed(lambda: generator.analyze_song(song_path), repeats,
+                                 setup=generator.analysis_cache.memory.clear)
+    record(results, f"stages/analyze_song/{label}", timing, beats=len(analysis['beats']))
+
+    timing, events = run_timed(lambda: generator.schedule_nuances(analysis, seed=0), repeats)
+    record(results, f"stages/schedule_nuances/{label}", timing, events=len(events))
+
+    def apply():
+        return generator.apply_nuances(analysis, events, use_pool=False, session=generator.new_session(seed=0))
+
+    def clear_sample_caches():
+        catalog.synth_cache.clear()
+        catalog.resample_cache.clear()
+
+    timing, _ = run_timed(apply, repeats, setup=clear_sample_caches)
+    record(results, f"stages/apply_nuances/{label}/cold", timing)
+    timing, _ = run_timed(apply, repeats)
+    record(results, f"stages/apply_nuances/{label}/warm", timing)
+    generator.close()
+
+# Tempos of the synthetic songs the beat trackers are scored on
+BEAT_BPMS = (90, 120, 140)
+
+def test_song_beats(duration, bpm):
+    """Ground-truth beat times of generate_test_song(): where each beat's kick gate opens
+
+    The kick sounds while sin(2*pi*t*bpm/60) > 0.8, so it starts asin(0.8)/(2*pi)
+    of a beat after every multiple of 60/bpm. Chords change every 4 beats from
+    the start, so every 4th of these is a downbeat.
+    """
+    period = 60 / bpm
+    return np.arange(np.arcsin(0.8) / (2 * np.pi) * period, duration, period)
+
+def beat_f_measure(reference, estimated, tolerance=0.07):
+    """F-measure of estimated beat times, each matching at most one reference within `tolerance` s"""
+    matched = i = j = 0
+    while i < len(reference) and j < len(estimated):
+        if abs(reference[i] - estimated[j]) <= tolerance:
+            matched += 1
+            i += 1
+            j += 1
+        elif estimated[j] < reference[i]:
+            j += 1
+        else:
+            i += 1
+    if matched == 0:
+        return 0.0
+    precision = matched / len(estimated)
+    recall = matched / len(reference)
+    return 2 * precision * recall / (precision + recall)
+
+def benchmark_beat_trackers(results, workdir, duration=30.0, repeats=3):
+    """Speed and accuracy of every installed beat tracking backend
+
+    Only tracking itself is timed: the onset envelope and chroma the backends
+    share are computed beforehand. Beats and downbeats are scored by F-measure
+    (±70 ms) against the synthetic songs' grid, along with the tempo error.
+    """
+    available = available_beat_trackers()
+    for name in BEAT_TRACKERS:
+        if name not in available:
+            print(f"(skipping {name}: not installed)")
+    for bpm in BEAT_BPMS:
+        song_path = make_test_song(workdir, duration, bpm)
+        y, sr = sf.read(song_path, dtype='float32')
+        os.remove(song_path)
+        features = SongFeatures(y, sr)
+        features.onset_envelope, features.chroma
+        reference = test_song_beats(duration, bpm)
+        for name in available:
+            tracker = get_beat_tracker(name)
+            timing, (tempo, beats, downbeats) = run_timed(lambda: tracker.track(features, y, sr), repeats)
+            record(results, f"beats/{name}/{bpm}bpm", timing, tempo=round(tempo, 1),
+                   tempo_error=round(abs(tempo - bpm) / bpm, 4),
+                   beat_f=round(beat_f_measure(reference, beats), 3),
+                   downbeat_f=round(beat_f_measure(reference[::4], downbeats), 3))
+
+def benchmark_process_song(results, workdir, durations, repeats=3):
+    """Full process_song with a fresh generator (cold caches) per run"""
+    samples_dir = os.path.join(workdir, 'samples')
+    output_path = os.path.join(workdir, 'output.wav')
+    for duration in durations:
+        song_path = make_test_song(workdir, duration)
+        streaming = duration > STREAM_ABOVE
+        generators = []
+
+        def fresh_generator():
+            generators.append(SongNuanceGenerator(samples_dir, analysis_cache_dir=None))
+
+        timing, nuance_map = run_timed(
+            lambda: generators[-1].process_song(song_path, output_path, seed=0, streaming=streaming),
+            # Long songs take minutes per run, so they are only timed once
+            repeats if duration <= 60 else 1, setup=fresh_generator)
+        for generator in generators:
+            generator.close()
+        record(results, f"e2e/process_song/{duration:g}s", timing, events=len(nuance_map['events']),
+               realtime=duration / timing['best'], streaming=streaming)
+        os.remove(song_path)
+
+def compare_to_baseline(results, baseline, threshold, min_delta=0.001):
+    """Print timings against a baseline; returns the names that got slower
+
+    A benchmark regresses when its best time is more than `threshold` (a
+    fraction) slower than the baseline's and by more than `min_delta`
+    seconds, so jitter on sub-millisecond timings isn't flagged.
+    """
+    regressions = []
+    print(f"{'benchmark':<44}{'baseline ms':>12}{'now ms':>12}{'ratio':>8}")
+    for name, timing in results.items():
+        before = baseline['results'].get(name)
+        if before is None:
+            continue
+        ratio = timing['best'] / before['best']
+        regressed = ratio > 1 + threshold and timing['best'] - before['best'] > min_delta
+        if regressed:
+            regressions.append(name)
+        print(f"{name:<44}{before['best'] * 1000:>12.2f}{timing['best'] * 1000:>12.2f}"
+              f"{ratio:>7.2f}x{'  ❌ regression' if regressed else ''}")
+    missing = sorted(set(baseline['results']) - set(results))
+    if missing:
+        print(f"({len(missing)} baseline benchmarks were not run)")
+    return regressions
+
+SUITES = ['legacy', 'effects', 'generators', 'stages', 'beats', 'e2e', 'dtype']
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the AI Song Nuance Generator')
+    parser.add_argument('--suite', nargs='+', choices=SUITES, default=SUITES,
+                        help='Suites to run (default: all)')
+    parser.add_argument('--durations', nargs='+', type=float, default=[30, 300, 3600],
+                        help='Song lengths in seconds for the e2e suite (default: 30 300 3600)')
+    parser.add_argument('--stage-duration', type=float, default=30.0,
+                        help='Song length in seconds for the stages and beats suites (default: 30)')
+    parser.add_argument('--repeats', type=int, default=3, help='Timed runs per benchmark (default: 3)')
+    parser.add_argument('--json', help='Write the results to this file (e.g. to use as a baseline)')
+    parser.add_argument('--baseline', help='Compare against results saved with --json')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Slowdown fraction reported as a regression (default: 0.2)')
+    args = parser.parse_args(argv)
+
+    results = {}
+    passed = True
+    workdir = tempfile.mkdtemp(prefix='nuance_bench_')
+    try:
+        if 'legacy' in args.suite:
+            print("=== Effects against the legacy loops (best of 3) ===\n")
+            passed = benchmark_effects(results, workdir)
+        if 'effects' in args.suite:
+            print("\n=== Effects ===\n")
+            print_header()
+            benchmark_effect_bank(results, args.repeats)
+        if 'generators' in args.suite:
+            print("\n=== Generators ===\n")
+            print_header()
+            benchmark_generators(results, args.repeats)
+        if {'stages', 'beats', 'e2e'} & set(args.suite):
+            warm_up(workdir)
+        if 'stages' in args.suite:
+            print("\n=== Pipeline stages ===\n")
+            print_header()
+            benchmark_stages(results, workdir, args.stage_duration, args.repeats)
+        if 'beats' in args.suite:
+            print("\n=== Beat trackers ===\n")
+            print_header()
+            benchmark_beat_trackers(results, workdir, args.stage_duration, args.repeats)
+        if 'e2e' in args.suite:
+            print("\n=== process_song ===\n")
+            print_header()
+            benchmark_process_song(results, workdir, args.durations, args.repeats)
+        if 'dtype' in args.suite:
+            print("\n=== dtype policy: synthesis and mixing ===\n")
+            benchmark_dtypes(results, workdir)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'meta': {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'librosa': librosa.__version__,
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'repeats': args.repeats,
+        },
+        'results': results,
+    }
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults saved to: {args.json}")
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f"\n=== Against {args.baseline} (threshold {args.threshold:.0%}) ===\n")
+        regressions = compare_to_baseline(results, baseline, args.threshold)
+        for name in regressions:
+            print(f"❌ Regression: {name}")
+
+    return 0 if passed and not regressions else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
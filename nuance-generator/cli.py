@@ -1,19 +1,59 @@
 #!/usr/bin/env python3
 """
 CLI interface for the AI Song Nuance Generator
+
+    python cli.py input.wav output.wav [options]
+    python cli.py batch albums/ "live/*.wav" -o rendered/ --jobs 4 [options]
 """
 
 import argparse
+import glob
+import hashlib
+import json
+import os
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
-from nuance_generator import SongNuanceGenerator
+from typing import Dict, List
+from beat_tracking import BEAT_TRACKERS, DEFAULT_BEAT_TRACKER, get_beat_tracker
+from nuance_generator import SongNuanceGenerator, nuance_map_path
+
+AUDIO_EXTENSIONS = ('.wav', '.mp3', '.flac', '.ogg')
+BATCH_MANIFEST = "batch_manifest.json"
+
+# Each batch worker process builds its generator (and catalog) once
+_worker_generator = None
+
+def seed_arg(value: str) -> int:
+    """argparse type of --seed: a non-negative integer"""
+    seed = int(value)
+    if seed < 0:
+        raise argparse.ArgumentTypeError(f"seed must be a non-negative integer, got {seed}")
+    return seed
 
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] == 'batch':
+        return batch_main(sys.argv[2:])
+    
     parser = argparse.ArgumentParser(description='Add AI-generated nuances to songs')
     parser.add_argument('input', help='Input audio file (WAV/MP3)')
     parser.add_argument('output', help='Output audio file (WAV)')
     parser.add_argument('--samples-dir', default='samples', help='Directory containing nuance samples')
+    parser.add_argument('--arena', default=None,
+                        help='Compiled sample arena to memory-map instead of loading --samples-dir')
     parser.add_argument('--dry-run', action='store_true', help='Analyze only, don\'t generate output')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Processes used to synthesize nuance samples in parallel (default: 1)')
+    parser.add_argument('--stream', action='store_true',
+                        help='Render in blocks with flat memory use (for hour-long mixes)')
+    parser.add_argument('--seed', type=seed_arg, default=None,
+                        help='Seed for a reproducible render (same input + seed = same output)')
+    parser.add_argument('--profile', action='store_true',
+                        help='Print per-stage timings and save a Chrome trace next to the output')
+    parser.add_argument('--beat-tracker', choices=list(BEAT_TRACKERS), default=DEFAULT_BEAT_TRACKER,
+                        help='Beat tracking backend: librosa, madmom (most accurate, needs madmom) '
+                             'or preview (fastest, fixed tempo) (default: librosa)')
     
     args = parser.parse_args()
     
@@ -25,7 +65,8 @@ def main():
     
     # Initialize generator
     try:
-        generator = SongNuanceGenerator(args.samples_dir)
+        generator = SongNuanceGenerator(args.samples_dir, workers=args.workers, arena_path=args.arena,
+                                        beat_tracker=args.beat_tracker)
     except Exception as e:
         print(f"Error initializing generator: {e}")
         sys.exit(1)
@@ -33,11 +74,11 @@ def main():
     if args.dry_run:
         # Just analyze the song
         analysis = generator.analyze_song(str(input_path))
-        events = generator.schedule_nuances(analysis)
+        events = generator.schedule_nuances(analysis, seed=args.seed)
         print(f"\nAnalysis Results:")
         print(f"  Tempo: {float(analysis['tempo']):.1f} BPM")
         print(f"  Duration: {analysis['duration']:.1f} seconds")
-        print(f"  Beats detected: {len(analysis['beats'])}")
+        print(f"  Beats detected: {len(analysis['beats'])} ({analysis['beat_tracker']})")
         print(f"  Nuances scheduled: {len(events)}")
         
         # Show event details
@@ -48,12 +89,186 @@ def main():
     else:
         # Process the full song
         try:
-            result = generator.process_song(str(input_path), args.output)
+            result = generator.process_song(str(input_path), args.output, seed=args.seed,
+                                            streaming=args.stream, profile=args.profile)
             print(f"\nSuccess! Enhanced song saved to: {args.output}")
-            print(f"Nuance map saved to: {args.output.replace('.wav', '_nuance_map.json')}")
+            print(f"Nuance map saved to: {nuance_map_path(args.output)}")
         except Exception as e:
             print(f"Error processing song: {e}")
             sys.exit(1)
+        finally:
+            generator.close()
+
+def batch_main(argv: List[str]):
+    """Render many songs on a pool of worker processes, resuming where the last run stopped"""
+    parser = argparse.ArgumentParser(prog='cli.py batch',
+                                     description='Add AI-generated nuances to many songs')
+    parser.add_argument('inputs', nargs='+', help='Input files, directories (searched recursively) or globs')
+    parser.add_argument('-o', '--output-dir', required=True, help='Directory for rendered songs')
+    parser.add_argument('--jobs', type=int, default=1, help='Songs rendered in parallel (default: 1)')
+    parser.add_argument('--samples-dir', default='samples', help='Directory containing nuance samples')
+    parser.add_argument('--arena', default=None,
+                        help='Compiled sample arena to memory-map instead of loading --samples-dir')
+    parser.add_argument('--stream', action='store_true',
+                        help='Render in blocks with flat memory use (for hour-long mixes)')
+    parser.add_argument('--seed', type=seed_arg, default=None,
+                        help='Seed for reproducible renders (same input + seed = same output)')
+    parser.add_argument('--force', action='store_true',
+                        help='Re-render songs the manifest lists as already done')
+    parser.add_argument('--beat-tracker', choices=list(BEAT_TRACKERS), default=DEFAULT_BEAT_TRACKER,
+                        help='Beat tracking backend: librosa, madmom or preview (default: librosa)')
+    
+    args = parser.parse_args(argv)
+    
+    # Fail before planning the batch if the backend can't run here
+    try:
+        get_beat_tracker(args.beat_tracker)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    
+    jobs = plan_batch(collect_inputs(args.inputs, exclude=output_dir), output_dir)
+    if not jobs:
+        print("Error: No audio files found")
+        sys.exit(1)
+    
+    manifest_path = output_dir / BATCH_MANIFEST
+    manifest = load_batch_manifest(manifest_path)
+    # Songs rendered with other settings are rendered again
+    settings = {'seed': args.seed, 'streaming': args.stream, 'beat_tracker': args.beat_tracker}
+    pending = []
+    for input_path, output_path in jobs:
+        if not args.force and is_rendered(manifest.get(input_path), input_path, output_path, settings):
+            print(f"[skip] {input_path} (already rendered)")
+        else:
+            pending.append((input_path, output_path))
+    
+    print(f"Rendering {len(pending)} of {len(jobs)} songs with {args.jobs} job(s)")
+    started = time.perf_counter()
+    results = []
+    
+    def record(input_path, output_path, result):
+        stat = os.stat(input_path)
+        manifest[input_path] = {'output': output_path, 'size': stat.st_size,
+                                'mtime': stat.st_mtime_ns, 'settings': settings, **result}
+        save_batch_manifest(manifest_path, manifest)
+        results.append(result)
+        
+        done = f"[{len(results)}/{len(pending)}]"
+        if result['status'] == 'done':
+            print(f"{done} done  {input_path} -> {output_path} ({result['events']} nuances, "
+                  f"{result['seconds']:.1f}s, {result['duration'] / result['seconds']:.1f}x realtime)")
+        else:
+            print(f"{done} error {input_path}: {result['error']}")
+    
+    worker_args = (args.samples_dir, args.arena, args.beat_tracker)
+    if args.jobs <= 1:
+        _init_worker(*worker_args)
+        try:
+            for input_path, output_path in pending:
+                record(input_path, output_path, _render_job(input_path, output_path, args.seed, args.stream))
+        finally:
+            _worker_generator.close()
+    else:
+        with ProcessPoolExecutor(max_workers=args.jobs, initializer=_init_worker,
+                                 initargs=worker_args) as pool:
+            futures = {pool.submit(_render_job, input_path, output_path, args.seed, args.stream):
+                       (input_path, output_path) for input_path, output_path in pending}
+            for future in as_completed(futures):
+                record(*futures[future], future.result())
+    
+    # Aggregate throughput
+    elapsed = time.perf_counter() - started
+    succeeded = [result for result in results if result['status'] == 'done']
+    audio_seconds = sum(result['duration'] for result in succeeded)
+    print(f"\nBatch complete: {len(succeeded)} rendered, {len(results) - len(succeeded)} failed, "
+          f"{len(jobs) - len(pending)} skipped")
+    if elapsed > 0 and succeeded:
+        print(f"Throughput: {audio_seconds / 60:.1f} min of audio in {elapsed:.1f}s "
+              f"({audio_seconds / elapsed:.1f}x realtime, {len(succeeded) / elapsed * 60:.1f} songs/min)")
+    print(f"Manifest: {manifest_path}")
+    if len(succeeded) < len(results):
+        sys.exit(1)
+
+def collect_inputs(inputs: List[str], exclude: Path = None) -> List[str]:
+    """Expand files, directories and glob patterns into a sorted list of audio files"""
+    found = set()
+    for item in inputs:
+        if glob.has_magic(item):
+            candidates = [Path(path) for path in glob.glob(item, recursive=True)]
+        elif Path(item).is_dir():
+            candidates = list(Path(item).rglob('*'))
+        else:
+            candidates = [Path(item)]
+        for path in candidates:
+            if path.is_file() and path.suffix.lower() in AUDIO_EXTENSIONS:
+                found.add(path.resolve())
+    
+    # Never pick up previous renders when the output directory is inside an input directory
+    if exclude is not None:
+        exclude = exclude.resolve()
+        found = {path for path in found if exclude not in path.parents}
+    return sorted(str(path) for path in found)
+
+def batch_output_name(input_path: str) -> str:
+    """Output file name of an input, derived from its path alone
+    
+    A short hash of the full path keeps songs with the same name in different
+    folders apart, and a song keeps its output name however the batch changes.
+    """
+    digest = hashlib.blake2b(os.fsencode(input_path), digest_size=4).hexdigest()
+    return f"{Path(input_path).stem}_{digest}_nuanced.wav"
+
+def plan_batch(inputs: List[str], output_dir: Path) -> List[tuple]:
+    """Pair every input with its output path in output_dir"""
+    return [(input_path, str(output_dir / batch_output_name(input_path))) for input_path in inputs]
+
+def load_batch_manifest(path: Path) -> Dict:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_batch_manifest(path: Path, manifest: Dict):
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+def is_rendered(entry: Dict, input_path: str, output_path: str, settings: Dict) -> bool:
+    """Whether the manifest shows this exact input was already rendered to output_path with these settings"""
+    if not entry or entry.get('status') != 'done' or entry.get('output') != output_path:
+        return False
+    if entry.get('settings') != settings:
+        return False
+    if not os.path.exists(output_path):
+        return False
+    stat = os.stat(input_path)
+    return entry.get('size') == stat.st_size and entry.get('mtime') == stat.st_mtime_ns
+
+def _init_worker(samples_dir: str, arena_path: str, beat_tracker: str = DEFAULT_BEAT_TRACKER):
+    """Process-pool initializer: load the catalog once for every song this worker renders"""
+    global _worker_generator
+    _worker_generator = SongNuanceGenerator(samples_dir, arena_path=arena_path, beat_tracker=beat_tracker)
+
+def _render_job(input_path: str, output_path: str, seed: int, streaming: bool) -> Dict:
+    """Render one song with this worker's generator; failures are reported, not raised"""
+    started = time.perf_counter()
+    try:
+        result = _worker_generator.process_song(input_path, output_path, seed=seed, streaming=streaming)
+    except Exception as e:
+        return {'status': 'error', 'error': str(e) or type(e).__name__,
+                'seconds': time.perf_counter() - started}
+    return {
+        'status': 'done',
+        'seconds': time.perf_counter() - started,
+        'duration': result['analysis']['duration'],
+        'events': len(result['events']),
+    }
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,128 @@
+"""
+Columnar table of scheduled nuance events
+
+The scheduler produces events as parallel numpy arrays (one row per event)
+rather than a list of dicts, so scheduling multi-hour beat grids stays
+vectorized. Rows support the read-only mapping access used for event dicts
+elsewhere (`event['time']`, `event.get('seed')`), so renderers accept either;
+dicts are only built at the JSON edge with to_dicts().
+"""
+
+from typing import Dict, Iterator, List, Optional, Sequence, Union
+
+import numpy as np
+
+# Nuance categories, indexed by the table's type codes
+NUANCE_TYPES = ['percussion', 'texture', 'riser', 'fx']
+
+
+class EventRow:
+    """View of one event in an EventTable, usable like an event dict"""
+
+    __slots__ = ('table', 'index')
+
+    def __init__(self, table: 'EventTable', index: int):
+        self.table = table
+        self.index = index
+
+    def __getitem__(self, key: str):
+        table, i = self.table, self.index
+        if key == 'time':
+            return float(table.time[i])
+        if key == 'type':
+            return NUANCE_TYPES[table.type_code[i]]
+        if key == 'beat_index':
+            return int(table.beat_index[i])
+        if key == 'bar_number':
+            return int(table.bar_number[i])
+        if key == 'volume_scale':
+            return float(table.volume_scale[i])
+        if key == 'seed':
+            return int(table.seed[i])
+        if key == 'context':
+            return {
+                'beat_in_bar': int(table.beat_in_bar[i]),
+                'section_boundary': bool(table.section_boundary[i]),
+                'tempo': table.tempo,
+            }
+        raise KeyError(key)
+
+    def get(self, key: str, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self) -> List[str]:
+        return list(EventTable.FIELDS)
+
+
+class EventTable:
+    """Scheduled nuance events as parallel arrays, in beat order"""
+
+    # Keys of each event's dict form, in the order they are written out
+    FIELDS = ('time', 'type', 'beat_index', 'bar_number', 'volume_scale', 'seed', 'context')
+
+    def __init__(self, time: np.ndarray, type_code: np.ndarray, beat_index: np.ndarray,
+                 volume_scale: np.ndarray, seed: np.ndarray, section_boundary: np.ndarray,
+                 tempo: float, bar_number: Optional[np.ndarray] = None,
+                 beat_in_bar: Optional[np.ndarray] = None, beats_per_bar: int = 4):
+        """Bar numbers and positions default to bars of `beats_per_bar` from beat 0"""
+        self.time = np.asarray(time, dtype=np.float64)
+        self.type_code = np.asarray(type_code, dtype=np.int8)
+        self.beat_index = np.asarray(beat_index, dtype=np.int64)
+        self.volume_scale = np.asarray(volume_scale, dtype=np.float64)
+        self.seed = np.asarray(seed, dtype=np.int64)
+        self.section_boundary = np.asarray(section_boundary, dtype=bool)
+        self.tempo = float(tempo)
+        self.bar_number = np.asarray(self.beat_index // beats_per_bar if bar_number is None else bar_number,
+                                     dtype=np.int64)
+        self.beat_in_bar = np.asarray(self.beat_index % beats_per_bar if beat_in_bar is None else beat_in_bar,
+                                      dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.time)
+
+    def __getitem__(self, key: Union[int, slice, Sequence[int], np.ndarray]):
+        """A row for an integer index, a sub-table for a slice, index array or mask"""
+        if isinstance(key, (int, np.integer)):
+            index = range(len(self))[key]  # Bounds check and negative indices
+            return EventRow(self, index)
+        return EventTable(self.time[key], self.type_code[key], self.beat_index[key],
+                          self.volume_scale[key], self.seed[key], self.section_boundary[key],
+                          self.tempo, self.bar_number[key], self.beat_in_bar[key])
+
+    def __iter__(self) -> Iterator[EventRow]:
+        return (EventRow(self, i) for i in range(len(self)))
+
+    def types(self) -> List[str]:
+        return [NUANCE_TYPES[code] for code in self.type_code]
+
+    def to_dicts(self, limit: Optional[int] = None) -> List[Dict]:
+        """Events as JSON-serializable dicts (the first `limit` only, if given)"""
+        table = self if limit is None else self[:limit]
+        columns = {
+            'time': table.time.tolist(),
+            'type': table.types(),
+            'beat_index': table.beat_index.tolist(),
+            'bar_number': table.bar_number.tolist(),
+            'volume_scale': table.volume_scale.tolist(),
+            'seed': table.seed.tolist(),
+        }
+        beat_in_bar = table.beat_in_bar.tolist()
+        section_boundary = table.section_boundary.tolist()
+        return [
+            {**{key: columns[key][i] for key in columns},
+             'context': {'beat_in_bar': beat_in_bar[i], 'section_boundary': section_boundary[i],
+                         'tempo': table.tempo}}
+            for i in range(len(table))
+        ]
+
+
+# Renderers take scheduled events in either form
+Events = Union[EventTable, List[Dict]]
+
+
+def event_dicts(events: Events) -> List[Dict]:
+    """Events (an EventTable or a list of event dicts) as a list of dicts"""
+    return events.to_dicts() if isinstance(events, EventTable) else list(events)
@@ -0,0 +1,139 @@
+"""
+Bounded background job queue for long-running renders
+
+Jobs run on a fixed-size thread pool and submissions beyond the queue bound
+are refused instead of piling up. Every job gets its own directory under the
+queue's work dir; finished jobs and their files are deleted once they are
+older than the TTL.
+"""
+
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+
+class QueueFull(Exception):
+    """Raised when the queue already holds its maximum number of unfinished jobs"""
+
+
+class JobQueue:
+    """Runs submitted jobs on a bounded worker pool and tracks their status"""
+
+    def __init__(self, max_workers: int = 1, max_pending: int = 16, ttl: float = 3600.0,
+                 work_dir: Optional[str] = None):
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self.work_dir = Path(work_dir) if work_dir else Path(tempfile.mkdtemp(prefix='nuance_jobs_'))
+        self.work_dir.mkdir(parents=True, exist_ok=True)
+
+        self.jobs = {}      # job id -> job record
+        self._futures = {}  # job id -> Future of a submitted job
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='render-job')
+
+        self._stopped = threading.Event()
+        self._reaper = threading.Thread(target=self._reap_loop, name='job-reaper', daemon=True)
+        self._reaper.start()
+
+    def create(self) -> Dict:
+        """Reserve a queued job and its working directory; start it with submit() or drop it with discard()"""
+        with self._lock:
+            unfinished = sum(1 for job in self.jobs.values() if job['status'] in ('queued', 'running'))
+            if unfinished >= self.max_pending:
+                raise QueueFull(f"{unfinished} jobs are already waiting")
+            job_id = uuid.uuid4().hex
+            job = {
+                'id': job_id,
+                'status': 'queued',
+                'created': time.time(),
+                'started': None,
+                'finished': None,
+                'error': None,
+                'result': None,
+                'dir': self.work_dir / job_id,
+            }
+            job['dir'].mkdir()
+            self.jobs[job_id] = job
+        return job
+
+    def submit(self, job_id: str, func: Callable[..., Dict], *args):
+        """Run func(*args) for a created job; its return value becomes the job result"""
+        with self._lock:
+            job = self.jobs[job_id]
+            self._futures[job_id] = self._executor.submit(self._run, job, func, args)
+
+    def discard(self, job_id: str):
+        """Forget a job and delete its files (e.g. when its upload failed)"""
+        with self._lock:
+            job = self.jobs.pop(job_id, None)
+            self._futures.pop(job_id, None)
+        if job is not None:
+            shutil.rmtree(job['dir'], ignore_errors=True)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Snapshot of a job's status, or None if it is unknown or expired"""
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            snapshot = {k: v for k, v in job.items() if k != 'dir'}
+            if job['status'] == 'queued':
+                snapshot['position'] = sum(1 for other in self.jobs.values()
+                                           if other['status'] == 'queued' and other['created'] <= job['created'])
+            return snapshot
+
+    def wait(self, job_id: str, timeout: Optional[float] = None) -> Optional[Dict]:
+        """Block until a submitted job finishes and return its final status"""
+        with self._lock:
+            future = self._futures.get(job_id)
+        if future is not None:
+            future.result(timeout)
+        return self.get(job_id)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counts = {'queued': 0, 'running': 0, 'done': 0, 'error': 0}
+            for job in self.jobs.values():
+                counts[job['status']] += 1
+        return {**counts, 'max_pending': self.max_pending, 'ttl': self.ttl}
+
+    def shutdown(self):
+        """Stop accepting work and the reaper; running jobs are left to finish"""
+        self._stopped.set()
+        self._executor.shutdown(wait=False)
+
+    def _run(self, job: Dict, func: Callable[..., Dict], args: tuple):
+        with self._lock:
+            job['status'] = 'running'
+            job['started'] = time.time()
+        try:
+            result = func(*args)
+        except Exception as e:
+            with self._lock:
+                job['status'] = 'error'
+                job['error'] = str(e) or type(e).__name__
+                job['finished'] = time.time()
+            return
+        with self._lock:
+            job['status'] = 'done'
+            job['result'] = result
+            job['finished'] = time.time()
+
+    def _reap_loop(self):
+        """Delete finished jobs once they are older than the TTL"""
+        interval = min(60.0, max(1.0, self.ttl / 4))
+        while not self._stopped.wait(interval):
+            self.reap()
+
+    def reap(self):
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            expired = [job_id for job_id, job in self.jobs.items()
+                       if job['finished'] is not None and job['finished'] < cutoff]
+        for job_id in expired:
+            self.discard(job_id)
@@ -5,14 +5,39 @@ import random
 import os
 from pathlib import Path
 import json
-from typing import Dict, List, Tuple, Optional
+import uuid
+import shutil
+import tempfile
+import threading
+from typing import BinaryIO, Dict, List, Tuple, Optional, Union
+from concurrent.futures import ProcessPoolExecutor
 import scipy.signal
+from sample_pool import SamplePool
+from sample_manifest import SampleManifest
+from sample_arena import SampleRecord, load_arena
+from sample_cache import LRUBufferCache
+from analysis_cache import DEFAULT_CACHE_DIR, AnalysisCache, ContentHash, content_hash
+from profiler import StageProfiler, profiled, stage
+from analysis_engine import (ANALYSIS_SR, SongFeatures, StreamingResampler, checkerboard_novelty,
+                             novelty_boundaries)
+from beat_tracking import DEFAULT_BEAT_TRACKER, bar_positions, get_beat_tracker
+from event_table import EventTable, Events, NUANCE_TYPES, event_dicts
+from dsp_kernels import (sine_lfo, modulated_delay, one_pole_lowpass,
+                         swept_one_pole_lowpass, feedback_comb)
 
 class AINoiseGenerator:
     """Generate unique procedural audio samples using AI techniques"""
     
-    def __init__(self):
+    # Bump whenever synthesis changes so cached samples from older versions aren't reused
+    VERSION = 3
+    
+    def __init__(self, seed: Optional[int] = None, dtype=np.float32):
         self.sr = 44100
+        # Sample dtype of every generated signal and effect output
+        self.dtype = np.dtype(dtype)
+        # Private RNG streams; a fixed seed makes every generated sample reproducible
+        self.rng = random.Random(seed)
+        self.np_rng = np.random.default_rng(seed)
         self.effect_bank = [
             'chorus', 'delay', 'reverb', 'distortion', 'filter_sweep', 
             'pitch_shift', 'granular', 'bit_crush', 'flanger', 'phaser'
@@ -21,10 +46,10 @@ class AINoiseGenerator:
     def apply_random_effects(self, audio: np.ndarray) -> np.ndarray:
         """Apply random combination of audio effects to make each sound unique"""
         # Randomly choose 1-3 effects
-        num_effects = random.randint(1, 3)
-        chosen_effects = random.sample(self.effect_bank, num_effects)
+        num_effects = self.rng.randint(1, 3)
+        chosen_effects = self.rng.sample(self.effect_bank, num_effects)
         
-        processed_audio = audio.copy()
+        processed_audio = self._cast(audio).copy()
         
         for effect in chosen_effects:
             if effect == 'chorus':
@@ -47,54 +72,65 @@ class AINoiseGenerator:
                 processed_audio = self._apply_flanger(processed_audio)
             elif effect == 'phaser':
                 processed_audio = self._apply_phaser(processed_audio)
+            
+            # Effects may work in float64 internally; cast back between stages
+            processed_audio = self._cast(processed_audio)
         
         return processed_audio
     
+    def _cast(self, audio: np.ndarray) -> np.ndarray:
+        """Convert a signal to the generator's dtype (no copy if it already matches)"""
+        return np.asarray(audio, dtype=self.dtype)
+    
+    def _sine(self, phase: np.ndarray) -> np.ndarray:
+        """Sine oscillator output in the generator's dtype
+        
+        The phase stays float64: a float32 phase drifts audibly for
+        high-frequency partials after a second or two.
+        """
+        return np.sin(phase, out=np.empty(np.shape(phase), dtype=self.dtype))
+    
+    def _noise(self, scale: float, num_samples: int) -> np.ndarray:
+        """Gaussian noise drawn directly in the generator's dtype"""
+        return self.np_rng.standard_normal(num_samples, dtype=self.dtype) * self.dtype.type(scale)
+    
+    @profiled('effect')
     def _apply_chorus(self, audio: np.ndarray) -> np.ndarray:
         """Apply chorus effect with random parameters"""
-        delay_samples = random.randint(int(0.01 * self.sr), int(0.03 * self.sr))
-        depth = random.uniform(0.3, 0.8)
-        rate = random.uniform(1, 5)
+        delay_samples = self.rng.randint(int(0.01 * self.sr), int(0.03 * self.sr))
+        depth = self.rng.uniform(0.3, 0.8)
+        rate = self.rng.uniform(1, 5)
         
         # Create delayed version with modulation
-        t = np.linspace(0, len(audio) / self.sr, len(audio))
-        modulation = depth * np.sin(2 * np.pi * rate * t)
+        modulation = sine_lfo(len(audio), self.sr, rate, depth)
         
-        # Simple chorus approximation
-        delayed = np.zeros_like(audio)
-        for i in range(len(audio)):
-            delay_offset = int(delay_samples + modulation[i] * delay_samples * 0.5)
-            if i - delay_offset >= 0:
-                delayed[i] = audio[i - delay_offset]
+        # Simple chorus approximation on a modulated delay line
+        delayed = modulated_delay(audio, delay_samples + modulation * delay_samples * 0.5)
         
         return 0.7 * audio + 0.3 * delayed
     
+    @profiled('effect')
     def _apply_delay(self, audio: np.ndarray) -> np.ndarray:
         """Apply delay effect with random parameters"""
-        delay_time = random.uniform(0.1, 0.4)  # 100-400ms delay
-        feedback = random.uniform(0.2, 0.6)
-        mix = random.uniform(0.2, 0.5)
+        delay_time = self.rng.uniform(0.1, 0.4)  # 100-400ms delay
+        feedback = self.rng.uniform(0.2, 0.6)
+        mix = self.rng.uniform(0.2, 0.5)
         
         delay_samples = int(delay_time * self.sr)
-        delayed = np.zeros(len(audio) + delay_samples)
-        delayed[:len(audio)] = audio
+        padded = np.zeros(len(audio) + delay_samples, dtype=audio.dtype)
+        padded[:len(audio)] = audio
         
         # Apply feedback
-        for i in range(delay_samples, len(delayed)):
-            if i - delay_samples < len(audio):
-                delayed[i] += feedback * delayed[i - delay_samples]
+        delayed = feedback_comb(padded, delay_samples, feedback)
         
         # Mix with original
-        output = np.zeros_like(audio)
-        for i in range(len(audio)):
-            output[i] = (1 - mix) * audio[i] + mix * delayed[i + delay_samples]
-        
-        return output
+        return (1 - mix) * audio + mix * delayed[delay_samples:]
     
+    @profiled('effect')
     def _apply_reverb(self, audio: np.ndarray) -> np.ndarray:
         """Apply reverb effect using multiple delays"""
-        reverb_time = random.uniform(0.5, 2.0)
-        wetness = random.uniform(0.2, 0.6)
+        reverb_time = self.rng.uniform(0.5, 2.0)
+        wetness = self.rng.uniform(0.2, 0.6)
         
         # Create multiple delays for reverb approximation
         delays = [
@@ -109,45 +145,44 @@ class AINoiseGenerator:
             if len(audio) > delay:
                 delayed = np.zeros_like(audio)
                 delayed[delay:] = audio[:-delay]
-                reverb_signal += delayed * random.uniform(0.1, 0.3)
+                reverb_signal += delayed * self.rng.uniform(0.1, 0.3)
         
         # Apply decay
-        decay_envelope = np.exp(-np.linspace(0, reverb_time * 3, len(audio)))
+        decay_envelope = np.exp(-np.linspace(0, reverb_time * 3, len(audio))).astype(audio.dtype)
         reverb_signal *= decay_envelope
         
         return (1 - wetness) * audio + wetness * reverb_signal
     
+    @profiled('effect')
     def _apply_distortion(self, audio: np.ndarray) -> np.ndarray:
         """Apply distortion effect"""
-        drive = random.uniform(2, 8)
-        mix = random.uniform(0.3, 0.7)
+        drive = self.rng.uniform(2, 8)
+        mix = self.rng.uniform(0.3, 0.7)
         
         # Soft clipping distortion
         distorted = np.tanh(drive * audio) / np.tanh(drive)
         
         return (1 - mix) * audio + mix * distorted
     
+    @profiled('effect')
     def _apply_filter_sweep(self, audio: np.ndarray) -> np.ndarray:
         """Apply sweeping filter effect"""
-        start_freq = random.uniform(200, 1000)
-        end_freq = random.uniform(2000, 8000)
+        start_freq = self.rng.uniform(200, 1000)
+        end_freq = self.rng.uniform(2000, 8000)
         
         # Create frequency sweep
         t = np.linspace(0, len(audio) / self.sr, len(audio))
         cutoff_freq = start_freq * (end_freq / start_freq) ** (t / t[-1])
         
-        # Apply simple filter approximation
-        filtered = audio.copy()
-        for i in range(1, len(audio)):
-            # Simple low-pass filter
-            alpha = min(0.5, cutoff_freq[i] / (self.sr / 2))
-            filtered[i] = alpha * audio[i] + (1 - alpha) * filtered[i-1]
+        # Apply simple low-pass filter approximation
+        alpha = np.minimum(0.5, cutoff_freq / (self.sr / 2))
         
-        return filtered
+        return swept_one_pole_lowpass(audio, alpha)
     
+    @profiled('effect')
     def _apply_pitch_shift(self, audio: np.ndarray) -> np.ndarray:
         """Apply pitch shifting"""
-        shift_ratio = random.uniform(0.7, 1.4)  # -30% to +40% pitch
+        shift_ratio = self.rng.uniform(0.7, 1.4)  # -30% to +40% pitch
         
         # Simple pitch shift by resampling
         if shift_ratio != 1.0:
@@ -162,30 +197,32 @@ class AINoiseGenerator:
             return shifted
         return audio
     
+    @profiled('effect')
     def _apply_granular(self, audio: np.ndarray) -> np.ndarray:
         """Apply granular synthesis effects"""
-        grain_size = random.randint(int(0.01 * self.sr), int(0.05 * self.sr))
-        density = random.uniform(0.3, 0.8)
+        grain_size = self.rng.randint(int(0.01 * self.sr), int(0.05 * self.sr))
+        density = self.rng.uniform(0.3, 0.8)
         
         granular = np.zeros_like(audio)
         
         # Create grains at random positions
         num_grains = int(len(audio) / grain_size * density)
         for _ in range(num_grains):
-            start_pos = random.randint(0, max(1, len(audio) - grain_size))
-            grain_start = random.randint(0, max(1, len(audio) - grain_size))
+            start_pos = self.rng.randint(0, max(1, len(audio) - grain_size))
+            grain_start = self.rng.randint(0, max(1, len(audio) - grain_size))
             
             # Extract and place grain
             grain = audio[grain_start:grain_start + grain_size]
             end_pos = min(start_pos + len(grain), len(granular))
-            granular[start_pos:end_pos] += grain[:end_pos - start_pos] * random.uniform(0.3, 0.8)
+            granular[start_pos:end_pos] += grain[:end_pos - start_pos] * self.rng.uniform(0.3, 0.8)
         
-        return granular * random.uniform(0.5, 1.0)
+        return granular * self.rng.uniform(0.5, 1.0)
     
+    @profiled('effect')
     def _apply_bit_crush(self, audio: np.ndarray) -> np.ndarray:
         """Apply bit crushing effect"""
-        bits = random.randint(4, 12)
-        sample_rate_reduction = random.randint(2, 8)
+        bits = self.rng.randint(4, 12)
+        sample_rate_reduction = self.rng.randint(2, 8)
         
         # Reduce bit depth
         max_val = 2 ** (bits - 1)
@@ -200,159 +237,156 @@ class AINoiseGenerator:
         
         return crushed
     
+    @profiled('effect')
     def _apply_flanger(self, audio: np.ndarray) -> np.ndarray:
         """Apply flanger effect"""
-        rate = random.uniform(0.2, 2.0)
-        depth = random.uniform(0.001, 0.01)  # in seconds
-        feedback = random.uniform(0.2, 0.7)
-        
-        t = np.linspace(0, len(audio) / self.sr, len(audio))
-        delay_mod = depth * (1 + np.sin(2 * np.pi * rate * t)) / 2
+        rate = self.rng.uniform(0.2, 2.0)
+        depth = self.rng.uniform(0.001, 0.01)  # in seconds
+        feedback = self.rng.uniform(0.2, 0.7)
         
-        flanged = audio.copy()
-        for i in range(len(audio)):
-            delay_samples = int(delay_mod[i] * self.sr)
-            if i - delay_samples >= 0:
-                flanged[i] += feedback * audio[i - delay_samples]
+        delay_mod = depth * (1 + sine_lfo(len(audio), self.sr, rate)) / 2
         
-        return flanged
+        return audio + feedback * modulated_delay(audio, delay_mod * self.sr)
     
+    @profiled('effect')
     def _apply_phaser(self, audio: np.ndarray) -> np.ndarray:
         """Apply phaser effect"""
-        rate = random.uniform(0.5, 3.0)
-        depth = random.uniform(0.3, 0.8)
+        rate = self.rng.uniform(0.5, 3.0)
+        depth = self.rng.uniform(0.3, 0.8)
         
         t = np.linspace(0, len(audio) / self.sr, len(audio))
-        phase_mod = depth * np.sin(2 * np.pi * rate * t)
+        phase_mod = (depth * np.sin(2 * np.pi * rate * t)).astype(audio.dtype)
         
         # Simple phase modulation
         phased = audio * (1 + phase_mod)
         
         return 0.7 * audio + 0.3 * phased
         
+    @profiled('generator')
     def generate_texture_pad(self, duration: float = 2.0, base_freq: float = 220.0) -> np.ndarray:
         """Generate ambient texture pad with unique characteristics"""
         sr = 44100
         t = np.linspace(0, duration, int(sr * duration), False)
         
         # Create unique harmonic series with random variations
-        harmonics = [1, random.uniform(1.8, 2.2), random.uniform(2.8, 3.2), 
-                    random.uniform(4.5, 5.5), random.uniform(7.0, 8.0)]
-        amplitudes = [1.0, random.uniform(0.3, 0.7), random.uniform(0.1, 0.4),
-                     random.uniform(0.05, 0.2), random.uniform(0.02, 0.1)]
+        harmonics = [1, self.rng.uniform(1.8, 2.2), self.rng.uniform(2.8, 3.2), 
+                    self.rng.uniform(4.5, 5.5), self.rng.uniform(7.0, 8.0)]
+        amplitudes = [1.0, self.rng.uniform(0.3, 0.7), self.rng.uniform(0.1, 0.4),
+                     self.rng.uniform(0.05, 0.2), self.rng.uniform(0.02, 0.1)]
         
-        sound = np.zeros_like(t)
+        sound = np.zeros(len(t), dtype=self.dtype)
         for harmonic, amp in zip(harmonics, amplitudes):
             freq = base_freq * harmonic
             # Add random phase and frequency modulation for uniqueness
-            phase = random.uniform(0, 2 * np.pi)
-            fm_rate = random.uniform(0.1, 0.5)
-            fm_depth = random.uniform(0.01, 0.05)
+            phase = self.rng.uniform(0, 2 * np.pi)
+            fm_rate = self.rng.uniform(0.1, 0.5)
+            fm_depth = self.rng.uniform(0.01, 0.05)
             
-            carrier = np.sin(2 * np.pi * freq * t + phase + 
-                           fm_depth * np.sin(2 * np.pi * fm_rate * t))
+            carrier = self._sine(2 * np.pi * freq * t + phase + 
+                                 fm_depth * np.sin(2 * np.pi * fm_rate * t))
             sound += amp * carrier
         
         # Unique envelope with random attack and decay
-        attack_time = random.uniform(0.1, 0.5)
-        release_time = random.uniform(0.3, 1.0)
+        attack_time = self.rng.uniform(0.1, 0.5)
+        release_time = self.rng.uniform(0.3, 1.0)
         attack_samples = int(attack_time * sr)
         release_samples = int(release_time * sr)
         
-        envelope = np.ones_like(t)
+        envelope = np.ones(len(t), dtype=self.dtype)
         if len(envelope) > attack_samples:
             envelope[:attack_samples] = np.linspace(0, 1, attack_samples)
         if len(envelope) > release_samples:
             envelope[-release_samples:] = np.linspace(1, 0, release_samples)
         
         # Add subtle noise for texture
-        noise_level = random.uniform(0.02, 0.08)
-        texture_noise = np.random.normal(0, noise_level, len(t))
+        noise_level = self.rng.uniform(0.02, 0.08)
+        texture_noise = self._noise(noise_level, len(t))
         
-        base_sound = (sound * envelope + texture_noise) * random.uniform(0.15, 0.35)
+        base_sound = (sound * envelope + texture_noise) * self.rng.uniform(0.15, 0.35)
         
         # Apply random effects for uniqueness
         return self.apply_random_effects(base_sound)
     
+    @profiled('generator')
     def generate_percussive_hit(self, hit_type: str = 'hit') -> np.ndarray:
         """Generate unique percussive sounds using physical modeling"""
         sr = 44100
         
         if hit_type == 'crash':
             # Cymbal-like crash using noise and resonance
-            duration = random.uniform(1.5, 3.0)
+            duration = self.rng.uniform(1.5, 3.0)
             t = np.linspace(0, duration, int(sr * duration), False)
             
             # High-frequency noise burst
-            noise = np.random.normal(0, 1, len(t))
+            noise = self._noise(1, len(t))
             
             # Multiple resonant frequencies (metallic harmonics)
             resonances = [
-                random.uniform(3000, 5000),
-                random.uniform(7000, 9000), 
-                random.uniform(12000, 15000),
-                random.uniform(18000, 22000)
+                self.rng.uniform(3000, 5000),
+                self.rng.uniform(7000, 9000), 
+                self.rng.uniform(12000, 15000),
+                self.rng.uniform(18000, 22000)
             ]
             
-            crash_sound = np.zeros_like(t)
+            crash_sound = np.zeros(len(t), dtype=self.dtype)
             for freq in resonances:
                 # Create resonant filter
-                q_factor = random.uniform(20, 50)  # High Q for metallic ring
+                q_factor = self.rng.uniform(20, 50)  # High Q for metallic ring
                 b, a = scipy.signal.butter(2, freq, btype='high', fs=sr)
                 resonant_noise = scipy.signal.filtfilt(b, a, noise)
                 
                 # Add slight frequency modulation
-                mod_rate = random.uniform(0.5, 2.0)
+                mod_rate = self.rng.uniform(0.5, 2.0)
                 freq_mod = 1 + 0.01 * np.sin(2 * np.pi * mod_rate * t)
-                crash_sound += resonant_noise * freq_mod * random.uniform(0.2, 0.5)
+                crash_sound += resonant_noise * freq_mod * self.rng.uniform(0.2, 0.5)
             
             # Sharp attack, long decay
-            envelope = np.exp(-t * random.uniform(1.5, 3.0))
-            base_crash = crash_sound * envelope * random.uniform(0.15, 0.25)
+            envelope = np.exp(-t * self.rng.uniform(1.5, 3.0)).astype(self.dtype)
+            base_crash = crash_sound * envelope * self.rng.uniform(0.15, 0.25)
             return self.apply_random_effects(base_crash)
             
         elif hit_type == 'click':
             # Sharp transient click
-            duration = random.uniform(0.05, 0.15)
+            duration = self.rng.uniform(0.05, 0.15)
             t = np.linspace(0, duration, int(sr * duration), False)
             
             # High-frequency burst
-            click_freq = random.uniform(2000, 8000)
-            click = np.sin(2 * np.pi * click_freq * t)
+            click_freq = self.rng.uniform(2000, 8000)
+            click = self._sine(2 * np.pi * click_freq * t)
             
             # Add some harmonics for texture
             for harmonic in [2, 3, 5]:
                 h_freq = click_freq * harmonic
                 if h_freq < sr / 2:  # Avoid aliasing
-                    click += random.uniform(0.1, 0.3) * np.sin(2 * np.pi * h_freq * t)
+                    click += self.rng.uniform(0.1, 0.3) * self._sine(2 * np.pi * h_freq * t)
             
             # Very sharp envelope
-            envelope = np.exp(-t * random.uniform(50, 100))
-            base_click = click * envelope * random.uniform(0.3, 0.5)
+            envelope = np.exp(-t * self.rng.uniform(50, 100)).astype(self.dtype)
+            base_click = click * envelope * self.rng.uniform(0.3, 0.5)
             return self.apply_random_effects(base_click)
             
         else:  # 'hit'
             # Drum-like percussive hit
-            duration = random.uniform(0.2, 0.8)
+            duration = self.rng.uniform(0.2, 0.8)
             t = np.linspace(0, duration, int(sr * duration), False)
             
             # Fundamental frequency (like a drum)
-            fundamental = random.uniform(60, 200)
+            fundamental = self.rng.uniform(60, 200)
             
             # Drum-like overtone series (not harmonic)
             overtones = [
-                fundamental * random.uniform(1.8, 2.2),
-                fundamental * random.uniform(2.8, 3.5),
-                fundamental * random.uniform(4.0, 5.5)
+                fundamental * self.rng.uniform(1.8, 2.2),
+                fundamental * self.rng.uniform(2.8, 3.5),
+                fundamental * self.rng.uniform(4.0, 5.5)
             ]
             
-            drum_sound = np.sin(2 * np.pi * fundamental * t)
+            drum_sound = self._sine(2 * np.pi * fundamental * t)
             for overtone in overtones:
-                drum_sound += random.uniform(0.2, 0.4) * np.sin(2 * np.pi * overtone * t)
+                drum_sound += self.rng.uniform(0.2, 0.4) * self._sine(2 * np.pi * overtone * t)
             
             # Add some noise for snare-like texture
-            noise_level = random.uniform(0.1, 0.3)
-            noise = np.random.normal(0, noise_level, len(t))
+            noise_level = self.rng.uniform(0.1, 0.3)
+            noise = self._noise(noise_level, len(t))
             
             # High-pass filter the noise for snare character
             b, a = scipy.signal.butter(2, 1000, btype='high', fs=sr)
@@ -361,64 +395,66 @@ class AINoiseGenerator:
             drum_sound += filtered_noise
             
             # Drum-like envelope (quick attack, exponential decay)
-            envelope = np.exp(-t * random.uniform(8, 15))
-            base_sound = drum_sound * envelope * random.uniform(0.2, 0.4)
+            envelope = np.exp(-t * self.rng.uniform(8, 15)).astype(self.dtype)
+            base_sound = drum_sound * envelope * self.rng.uniform(0.2, 0.4)
             
             # Apply random effects for uniqueness
             return self.apply_random_effects(base_sound)
     
+    @profiled('generator')
     def generate_riser(self, duration: float = 2.0) -> np.ndarray:
         """Generate unique riser/sweep sounds"""
         t = np.linspace(0, duration, int(duration * self.sr))
         
         # Frequency sweep
-        start_freq = random.uniform(100, 500)
-        end_freq = random.uniform(2000, 8000)
+        start_freq = self.rng.uniform(100, 500)
+        end_freq = self.rng.uniform(2000, 8000)
         
         # Exponential frequency sweep
         freq_curve = start_freq * (end_freq / start_freq) ** (t / duration)
         
         # Multiple oscillators with slight detuning
-        sound = np.zeros_like(t)
+        sound = np.zeros(len(t), dtype=self.dtype)
         for i in range(3):
-            detune = random.uniform(0.98, 1.02)
-            sound += np.sin(2 * np.pi * freq_curve * detune * t) / 3
+            detune = self.rng.uniform(0.98, 1.02)
+            sound += self._sine(2 * np.pi * freq_curve * detune * t) / 3
         
         # Add filtered noise
-        noise = np.random.normal(0, 0.3, len(t))
+        noise = self._noise(0.3, len(t))
         # Simple high-pass effect by differencing
-        noise = np.diff(np.concatenate([[0], noise]))
+        noise = np.diff(noise, prepend=noise.dtype.type(0))
         sound += noise
         
         # Rising envelope
-        envelope = (t / duration) ** 2
+        envelope = ((t / duration) ** 2).astype(self.dtype)
         
         base_sound = sound * envelope * 0.4
         
         # Apply random effects for uniqueness
         return self.apply_random_effects(base_sound)
     
+    @profiled('generator')
     def generate_vocal_chop(self) -> np.ndarray:
         """Generate unique vocal-like texture with formant synthesis"""
         sr = 44100
-        duration = random.uniform(0.3, 0.8)
+        duration = self.rng.uniform(0.3, 0.8)
         t = np.linspace(0, duration, int(sr * duration), False)
         
         # Create formant-like resonances (vocal tract simulation)
         formant_freqs = [
-            random.uniform(700, 900),   # F1 - openness
-            random.uniform(1200, 1600), # F2 - tongue position  
-            random.uniform(2400, 3000), # F3 - lip rounding
+            self.rng.uniform(700, 900),   # F1 - openness
+            self.rng.uniform(1200, 1600), # F2 - tongue position  
+            self.rng.uniform(2400, 3000), # F3 - lip rounding
         ]
         formant_bws = [60, 90, 120]  # bandwidths
         
         # Base excitation (simulated vocal cords)
-        f0 = random.uniform(120, 200)  # fundamental frequency
-        excitation = np.sin(2 * np.pi * f0 * t)
+        f0 = self.rng.uniform(120, 200)  # fundamental frequency
+        excitation = self._sine(2 * np.pi * f0 * t)
         
         # Add some breathiness/noise
-        breath_level = random.uniform(0.1, 0.3)
-        excitation += breath_level * np.random.normal(0, 1, len(t))
+        breath_level = self.rng.uniform(0.1, 0.3)
+        excitation += self._noise(breath_level, len(t))
         
         # Apply formant filtering
         vocal_sound = excitation
@@ -427,19 +463,19 @@ class AINoiseGenerator:
             b, a = scipy.signal.butter(2, [freq - bw/2, freq + bw/2], 
                                      btype='band', fs=sr)
             formant_response = scipy.signal.filtfilt(b, a, excitation)
-            vocal_sound += formant_response * random.uniform(0.3, 0.8)
+            vocal_sound += formant_response * self.rng.uniform(0.3, 0.8)
         
         # Random pitch modulation for expressiveness
-        vibrato_rate = random.uniform(4, 8)
-        vibrato_depth = random.uniform(0.02, 0.05)
-        pitch_mod = 1 + vibrato_depth * np.sin(2 * np.pi * vibrato_rate * t)
+        vibrato_rate = self.rng.uniform(4, 8)
+        vibrato_depth = self.rng.uniform(0.02, 0.05)
+        pitch_mod = 1 + vibrato_depth * self._sine(2 * np.pi * vibrato_rate * t)
         
         # Apply pitch modulation by time-stretching (simplified)
         vocal_sound = vocal_sound * pitch_mod
         
         # Dynamic envelope with random articulation
-        attack = random.uniform(0.02, 0.1)
-        sustain = random.uniform(0.3, 0.7)
+        attack = self.rng.uniform(0.02, 0.1)
+        sustain = self.rng.uniform(0.3, 0.7)
         release = duration - attack - sustain
         
         attack_samples = int(attack * sr)
@@ -447,9 +483,9 @@ class AINoiseGenerator:
         release_samples = len(t) - attack_samples - sustain_samples
         
         envelope = np.concatenate([
-            np.linspace(0, 1, attack_samples),
-            np.ones(sustain_samples),
-            np.linspace(1, 0, max(1, release_samples))
+            np.linspace(0, 1, attack_samples, dtype=self.dtype),
+            np.ones(sustain_samples, dtype=self.dtype),
+            np.linspace(1, 0, max(1, release_samples), dtype=self.dtype)
         ])
         
         # Ensure envelope matches signal length
@@ -457,79 +493,254 @@ class AINoiseGenerator:
             envelope = np.interp(np.linspace(0, 1, len(vocal_sound)), 
                                np.linspace(0, 1, len(envelope)), envelope)
         
-        base_sound = vocal_sound * envelope * random.uniform(0.2, 0.4)
+        base_sound = vocal_sound * envelope * self.rng.uniform(0.2, 0.4)
         
         # Apply random effects for uniqueness
         return self.apply_random_effects(base_sound)
     
+    @profiled('generator')
     def generate_glitch(self):
         """Generate digital glitch sounds"""
-        duration = random.uniform(0.1, 0.4)
+        duration = self.rng.uniform(0.1, 0.4)
         t = np.linspace(0, duration, int(duration * self.sr))
         
         # Digital-style sound
-        freq = random.uniform(200, 2000)
+        freq = self.rng.uniform(200, 2000)
         
         # Bit-crush effect simulation
-        levels = random.randint(4, 16)
-        sound = np.sin(2 * np.pi * freq * t)
+        levels = self.rng.randint(4, 16)
+        sound = self._sine(2 * np.pi * freq * t)
         sound = np.round(sound * levels) / levels
         
         # Add some aliasing-like effects
-        alias_freq = random.uniform(freq * 0.7, freq * 1.3)
-        sound += 0.3 * np.sin(2 * np.pi * alias_freq * t)
+        alias_freq = self.rng.uniform(freq * 0.7, freq * 1.3)
+        sound += 0.3 * self._sine(2 * np.pi * alias_freq * t)
         
         # Sharp envelope
-        envelope = np.exp(-8 * t)
+        envelope = np.exp(-8 * t).astype(self.dtype)
         
         base_sound = sound * envelope * 0.35
         
         # Apply random effects for uniqueness
         return self.apply_random_effects(base_sound)
+    
+    @property
+    def variant(self) -> str:
+        """Identifies the synthesis code and settings that produced a sample"""
+        return f"v{self.VERSION}@{self.sr}:{self.dtype.name}"
+    
+    def generate_sample(self, category: str) -> Dict:
+        """Generate a unique sample for the given nuance category"""
+        sr = 44100
+        unique_id = self.rng.randint(10000, 99999)  # Unique identifier
+        
+        if category == 'percussion':
+            hit_types = ['crash', 'click', 'hit']
+            hit_type = self.rng.choice(hit_types)
+            audio = self.generate_percussive_hit(hit_type)
+            name = f"ai_{hit_type}_{unique_id}"
+            
+        elif category == 'texture':
+            audio = self.generate_texture_pad(
+                duration=self.rng.uniform(1.5, 3.0),
+                base_freq=self.rng.uniform(80, 300)
+            )
+            name = f"ai_texture_{unique_id}"
+            
+        elif category == 'riser':
+            audio = self.generate_riser(
+                duration=self.rng.uniform(1.0, 2.5)
+            )
+            name = f"ai_riser_{unique_id}"
+            
+        elif category == 'fx':
+            fx_types = ['vocal_chop', 'glitch']
+            fx_type = self.rng.choice(fx_types)
+            if fx_type == 'vocal_chop':
+                audio = self.generate_vocal_chop()
+            else:
+                audio = self.generate_glitch()
+            name = f"ai_{fx_type}_{unique_id}"
+        
+        else:
+            # Fallback
+            audio = self._noise(0.1, sr // 4)
+            name = f"ai_fallback_{unique_id}"
+        
+        return {
+            'audio': self._cast(audio),
+            'sr': sr,
+            'duration': len(audio) / sr,
+            'type': 'ai_generated',
+            'name': name,
+            'category': category
+        }
+
+def derive_seed(*keys: int) -> int:
+    """Derive an independent 32-bit seed from a parent seed and integer keys"""
+    return int(np.random.SeedSequence(list(keys)).generate_state(1)[0])
+
+class RenderSession:
+    """Everything one render may change: parameters, sample-variety history and RNG
+    
+    A session is created per render and threaded through scheduling and
+    mixing, so the catalog and generator stay read-only and concurrent
+    renders on one generator don't affect each other.
+    """
+    
+    def __init__(self, params: Dict, categories: List[str], seed: Optional[int] = None):
+        # Seeds feed numpy's SeedSequence, which only takes non-negative integers
+        if seed is not None and seed < 0:
+            raise ValueError(f"seed must be a non-negative integer, got {seed}")
+        self.params = params
+        self.seed = seed
+        # Fallback stream for events without a seed; OS entropy without a session seed
+        self.rng = random.Random(seed)
+        # Scheduling stream, drawn from in vectorized passes
+        self.np_rng = np.random.default_rng(seed)
+        # Recently used library samples per category, to encourage variety
+        self.recent_samples = {category: [] for category in categories}
+    
+    @property
+    def ai_generation_rate(self) -> float:
+        """How often events use an AI sample instead of a library one"""
+        return self.params['creativity_level']
+    
+    def event_seeds(self, num_beats: int) -> np.ndarray:
+        """Seeds of events on beats 0..num_beats-1
+        
+        With a session seed they come from a stream of their own, so the seed
+        on a beat depends only on the session seed and the beat index.
+        """
+        rng = np.random.default_rng(derive_seed(self.seed, 0)) if self.seed is not None else self.np_rng
+        return rng.integers(0, 2**32, size=num_beats, dtype=np.int64)
+    
+    def event_rng(self, event: Dict, stream: int):
+        """Independent random stream `stream` of an event, reproducible from its seed"""
+        seed = event.get('seed')
+        return random.Random(derive_seed(seed, stream)) if seed is not None else self.rng
+
+# Songs can be read from and written to paths or file-like objects
+AudioSource = Union[str, os.PathLike, BinaryIO]
+
+def is_path(source: AudioSource) -> bool:
+    return isinstance(source, (str, os.PathLike))
+
+def source_name(source: AudioSource) -> str:
+    """Printable name of a path or stream"""
+    if is_path(source):
+        return os.fspath(source)
+    name = getattr(source, 'name', None)
+    return name if isinstance(name, str) else '<stream>'
+
+def nuance_map_path(output_path: str) -> str:
+    """Where process_song saves the nuance map of a render to output_path"""
+    return os.path.splitext(os.fspath(output_path))[0] + '_nuance_map.json'
+
+def profile_trace_path(output_path: str) -> str:
+    """Where the Chrome trace of a profiled render to output_path is saved"""
+    return os.path.splitext(os.fspath(output_path))[0] + '_profile.json'
+
+def _synthesize_event_sample(category: str, seed: int, dtype=np.float32) -> Dict:
+    """Process-pool worker: synthesize one event's AI sample from its seed"""
+    return AINoiseGenerator(seed, dtype).generate_sample(category)
 
 class NuanceCatalog:
     """Manages a library of audio samples for adding nuances to songs"""
     
-    def __init__(self, samples_dir: str = "samples"):
+    def __init__(self, samples_dir: str = "samples", prefetch_depth: int = 0,
+                 prefetch_low_water: Optional[int] = None, prefetch_workers: int = 1,
+                 synth_cache_bytes: int = 256 * 1024 * 1024,
+                 resample_cache_bytes: int = 256 * 1024 * 1024,
+                 decoded_cache_bytes: int = 256 * 1024 * 1024,
+                 arena_path: Optional[str] = None, dtype=np.float32):
         self.samples_dir = Path(samples_dir)
+        self.dtype = np.dtype(dtype)  # Sample dtype of decoded, synthesized and resampled audio
+        self.arena_path = arena_path  # Compiled sample arena to memory-map instead of the WAVs
         self.samples = {
             'percussion': [],  # one-shots, fills, crashes
             'texture': [],     # ambient layers, pads
             'riser': [],       # build-ups, sweeps
             'fx': []          # vocal chops, glitches
         }
-        self.ai_generator = AINoiseGenerator()
-        self.recent_samples = {k: [] for k in self.samples.keys()}  # Track recent usage
-        self.ai_generation_rate = 0.85  # Default rate for AI generation
+        self.ai_generator = AINoiseGenerator(dtype=self.dtype)
+        # Default rate for AI generation (renders use their session's creativity level)
+        self.ai_generation_rate = 0.85
+        self._decode_lock = threading.Lock()
+        # Seeded AI samples keyed by (category, generator variant, seed)
+        self.synth_cache = LRUBufferCache(synth_cache_bytes)
+        # Samples resampled to a song's rate keyed by (sample, target sr)
+        self.resample_cache = LRUBufferCache(resample_cache_bytes)
+        # Decoded library samples keyed by path
+        self.decoded_cache = LRUBufferCache(decoded_cache_bytes)
         self.load_samples()
+        
+        # Optional background pool of pre-synthesized AI samples
+        self.sample_pool = None
+        if prefetch_depth > 0:
+            self.sample_pool = SamplePool(
+                # Random seeds are never looked up again, so keep them out of the cache
+                lambda category: self.generate_ai_sample(category, random.getrandbits(32), cache=False),
+                list(self.samples.keys()),
+                target_depth=prefetch_depth, low_water=prefetch_low_water,
+                num_workers=prefetch_workers
+            )
+            self.sample_pool.start()
     
-    def load_samples(self):
-        """Load all samples from the samples directory"""
+    def load_samples(self, full_rescan: bool = False):
+        """Index all samples in the samples directory
+        
+        Samples come from the on-disk manifest (refreshed incrementally), so no
+        audio is decoded here; each sample is decoded the first time it is
+        selected.
+        """
+        if self.arena_path:
+            # Every sample is a zero-copy view into the memory-mapped arena
+            self.samples = load_arena(self.arena_path, list(self.samples.keys()))
+            print(f"Loaded samples: {[(k, len(v)) for k, v in self.samples.items()]} (arena)")
+            print("AI generator ready for procedural sounds")
+            return
+        
         if not self.samples_dir.exists():
             print(f"Samples directory {self.samples_dir} not found. Creating with example structure...")
             self.create_sample_structure()
             return
         
+        manifest = SampleManifest(self.samples_dir, list(self.samples.keys()))
+        if manifest.refresh(full=full_rescan):
+            manifest.save()
+        
         for category in self.samples.keys():
-            category_path = self.samples_dir / category
-            if category_path.exists():
-                for file_path in category_path.glob("*.wav"):
-                    try:
-                        audio, sr = librosa.load(str(file_path), sr=None)
-                        self.samples[category].append({
-                            'path': str(file_path),
-                            'audio': audio,
-                            'sr': sr,
-                            'duration': len(audio) / sr,
-                            'type': 'file',
-                            'name': file_path.stem
-                        })
-                    except Exception as e:
-                        print(f"Error loading {file_path}: {e}")
+            self.samples[category] = [
+                SampleRecord(str(self.samples_dir / entry['path']), Path(entry['path']).stem,
+                             category, entry['sr'], entry['duration'])
+                for entry in manifest.category_entries(category)
+            ]
         
         print(f"Loaded samples: {[(k, len(v)) for k, v in self.samples.items()]}")
         print("AI generator ready for procedural sounds")
     
+    def load_audio(self, sample: SampleRecord) -> SampleRecord:
+        """A library sample with its audio, decoding it if it isn't cached
+        
+        Decoded audio is kept in the bytes-bounded decoded cache rather than on
+        the catalog's shared record, so a large library is never held in
+        memory whole; the returned record is a copy carrying the audio. Arena
+        samples already hold views into the memory-mapped arena.
+        """
+        if sample.audio is not None:
+            return sample
+        audio = self.decoded_cache.get(sample.path)
+        if audio is None:
+            with self._decode_lock:
+                # Another render may have decoded it while we waited
+                audio = self.decoded_cache.get(sample.path)
+                if audio is None:
+                    audio, sr = librosa.load(sample.path, sr=None, dtype=self.dtype)
+                    sample.sr = sr
+                    self.decoded_cache.put(sample.path, audio, audio.nbytes)
+        return SampleRecord(sample.path, sample.name, sample.category, sample.sr, sample.duration, audio)
+    
     def create_sample_structure(self):
         """Create example directory structure for samples"""
         for category in self.samples.keys():
@@ -553,92 +764,268 @@ Note: The AI will also generate unique procedural sounds automatically!
         with open(self.samples_dir / "README.md", 'w') as f:
             f.write(readme_content)
     
-    def generate_ai_sample(self, category: str) -> Dict:
-        """Generate a unique AI sample for the given category"""
-        sr = 44100
-        unique_id = random.randint(10000, 99999)  # Unique identifier
-        
-        if category == 'percussion':
-            hit_types = ['crash', 'click', 'hit']
-            hit_type = random.choice(hit_types)
-            audio = self.ai_generator.generate_percussive_hit(hit_type)
-            name = f"ai_{hit_type}_{unique_id}"
-            
-        elif category == 'texture':
-            audio = self.ai_generator.generate_texture_pad(
-                duration=random.uniform(1.5, 3.0),
-                base_freq=random.uniform(80, 300)
-            )
-            name = f"ai_texture_{unique_id}"
-            
-        elif category == 'riser':
-            audio = self.ai_generator.generate_riser(
-                duration=random.uniform(1.0, 2.5)
-            )
-            name = f"ai_riser_{unique_id}"
-            
-        elif category == 'fx':
-            fx_types = ['vocal_chop', 'glitch']
-            fx_type = random.choice(fx_types)
-            if fx_type == 'vocal_chop':
-                audio = self.ai_generator.generate_vocal_chop()
-            else:
-                audio = self.ai_generator.generate_glitch()
-            name = f"ai_{fx_type}_{unique_id}"
+    def generate_ai_sample(self, category: str, seed: Optional[int] = None, cache: bool = True) -> Dict:
+        """Generate a unique AI sample for the given category
         
-        else:
-            # Fallback
-            audio = np.random.normal(0, 0.1, sr // 4)
-            name = f"ai_fallback_{unique_id}"
-        
-        return {
-            'audio': audio,
-            'sr': sr,
-            'duration': len(audio) / sr,
-            'type': 'ai_generated',
-            'name': name,
-            'category': category
-        }
+        Seeded samples are reproducible, so they are served from (and added to)
+        the synthesized-sample cache, unless `cache` is off (seeds drawn at
+        random would only push out samples that renders ask for again).
+        """
+        if seed is None:
+            with stage('synthesis', 'synthesis', nuance_type=category):
+                return self.ai_generator.generate_sample(category)
+        if not cache:
+            with stage('synthesis', 'synthesis', nuance_type=category):
+                return AINoiseGenerator(seed, self.dtype).generate_sample(category)
+        
+        key = self.synth_cache_key(category, seed)
+        sample = self.synth_cache.get(key)
+        if sample is None:
+            with stage('synthesis', 'synthesis', nuance_type=category):
+                sample = AINoiseGenerator(seed, self.dtype).generate_sample(category)
+            self.cache_ai_sample(category, seed, sample)
+        return sample
     
-    def get_smart_sample(self, category: str, context=None) -> Dict:
-        """Get a sample with smart selection to avoid repetition"""
-        available_samples = self.samples[category].copy()
+    def synth_cache_key(self, category: str, seed: int) -> Tuple:
+        return (category, self.ai_generator.variant, seed)
+    
+    def cache_ai_sample(self, category: str, seed: int, sample: Dict):
+        """Remember a seeded AI sample so later renders can reuse it"""
+        sample['seed'] = seed
+        self.synth_cache.put(self.synth_cache_key(category, seed), sample, sample['audio'].nbytes)
+    
+    def get_smart_sample(self, category: str, context=None, seed: Optional[int] = None,
+                         use_pool: bool = True, session: Optional[RenderSession] = None,
+                         cache: bool = True) -> Dict:
+        """Get a sample with smart selection to avoid repetition
+        
+        With a seed, the choice and any synthesized sample are reproducible
+        (given the same session history). Pooled samples were generated from
+        random seeds, so they are only used when `use_pool` allows it.
+        Synthesized samples are only cached with `cache`.
+        """
+        rng = random.Random(derive_seed(seed, 1)) if seed is not None else random
+        sample = self.select_library_sample(category, rng, session)
+        if sample is None:
+            if use_pool and self.sample_pool:
+                sample = self.sample_pool.get(category)
+            if sample is None:
+                sample = self.generate_ai_sample(category, seed, cache)
+        return sample
+    
+    def select_library_sample(self, category: str, rng=random,
+                              session: Optional[RenderSession] = None) -> Optional[SampleRecord]:
+        """Pick a library sample, or return None when the event should use an AI sample
+        
+        Variety history is kept in the render's session; without one, samples
+        are picked with no history.
+        """
+        if session is None:
+            session = RenderSession({'creativity_level': self.ai_generation_rate}, list(self.samples))
+        recent_samples = session.recent_samples
+        available_samples = self.samples[category]
         
         # Use dynamic AI generation rate based on creativity setting
-        use_ai = random.random() < self.ai_generation_rate or len(available_samples) == 0
+        use_ai = rng.random() < session.ai_generation_rate or len(available_samples) == 0
         
         if use_ai:
-            return self.generate_ai_sample(category)
+            return None
         
-        # Remove recently used samples to encourage variety
-        recent = self.recent_samples[category]
+        # Skip recently used samples to encourage variety, by redrawing rather
+        # than building a filtered copy of the category list
+        recent = recent_samples[category]
+        sample = rng.choice(available_samples)
         if len(recent) > 0 and len(available_samples) > len(recent):
-            available_samples = [s for s in available_samples if s['name'] not in recent]
-        
-        # If we filtered out everything, reset recent list
-        if not available_samples:
-            available_samples = self.samples[category].copy()
-            self.recent_samples[category] = []
+            for _ in range(32):
+                if sample.name not in recent:
+                    break
+                sample = rng.choice(available_samples)
+            else:
+                # Every draw was recent (duplicate names), so reset recent list
+                recent_samples[category] = []
         
-        # Select sample
-        sample = random.choice(available_samples)
+        # Decode on first use
+        sample = self.load_audio(sample)
         
         # Track usage (keep last 3 samples)
-        self.recent_samples[category].append(sample['name'])
-        if len(self.recent_samples[category]) > 3:
-            self.recent_samples[category].pop(0)
+        recent_samples[category].append(sample.name)
+        if len(recent_samples[category]) > 3:
+            recent_samples[category].pop(0)
         
         return sample
     
     def get_random_sample(self, category: str) -> Dict:
         """Get a random sample from a category (legacy method)"""
         return self.get_smart_sample(category)
+    
+    def resampled_audio(self, sample: Dict, target_sr: int) -> np.ndarray:
+        """A sample's audio at the target rate, resampling each sample only once per rate"""
+        sr = sample.get('sr', target_sr)
+        audio = np.asarray(sample['audio'], dtype=self.dtype)  # e.g. float32 arena views
+        if sr == target_sr:
+            return audio
+        
+        # Library samples are keyed by path, seeded AI samples by their synthesis key
+        if sample.get('path'):
+            key = (sample['path'], sr, target_sr)
+        elif sample.get('seed') is not None:
+            key = (self.synth_cache_key(sample['category'], sample['seed']), target_sr)
+        else:
+            with stage('resample'):
+                return self._resample(audio, sr, target_sr)
+        
+        resampled = self.resample_cache.get(key)
+        if resampled is None:
+            with stage('resample'):
+                resampled = self._resample(audio, sr, target_sr)
+            self.resample_cache.put(key, resampled, resampled.nbytes)
+        return resampled
+    
+    @staticmethod
+    def _resample(audio: np.ndarray, sr: int, target_sr: int) -> np.ndarray:
+        """Polyphase resampling by the reduced integer ratio of the two rates"""
+        divisor = np.gcd(int(sr), int(target_sr))
+        return scipy.signal.resample_poly(audio, target_sr // divisor, sr // divisor, axis=-1).astype(audio.dtype)
+    
+    def pool_stats(self) -> Optional[Dict]:
+        """Hit/miss counters of the prefetch pool (None when prefetching is off)"""
+        return self.sample_pool.stats() if self.sample_pool else None
+    
+    def close(self):
+        """Stop background workers"""
+        if self.sample_pool:
+            self.sample_pool.stop()
+
+class RegionPeaks:
+    """Running peak (max |x|) of a mix buffer, tracked per fixed-size region
+    
+    Regions are measured as the original audio is copied in and re-measured
+    only where events were mixed, so finding the normalization peak never
+    needs another pass over the whole buffer.
+    """
+    
+    def __init__(self, length: int, region_size: int = 65536):
+        self.region_size = region_size
+        self.peaks = np.zeros(max(1, -(-length // region_size)))
+        self.dirty = set()
+    
+    def observe(self, block: np.ndarray, start: int):
+        """Record the peaks of a region-aligned block just written at `start`"""
+        for offset in range(0, block.shape[-1], self.region_size):
+            region = block[..., offset:offset + self.region_size]
+            if region.size:
+                self.peaks[(start + offset) // self.region_size] = np.max(np.abs(region))
+    
+    def mark_dirty(self, start: int, end: int):
+        """Note that samples in [start, end) changed"""
+        if start < end:
+            self.dirty.update(range(start // self.region_size, (end - 1) // self.region_size + 1))
+    
+    def peak(self, audio: np.ndarray) -> float:
+        """Overall peak, re-measuring only the regions touched since they were observed"""
+        for region in sorted(self.dirty):
+            start = region * self.region_size
+            self.observe(audio[..., start:start + self.region_size], start)
+        self.dirty.clear()
+        return float(np.max(self.peaks))
+
+class LoudnessEnvelope:
+    """Cumulative energy of a song on a fixed hop, for O(1) windowed RMS lookups
+    
+    Computed once from the original audio during analysis and cached with it,
+    so every event ducks against the song itself rather than against a mix
+    buffer that earlier events have already changed. Windows are rounded out
+    to whole hops.
+    """
+    
+    HOP = 512
+    
+    def __init__(self, cumulative: np.ndarray, hop: int, length: int):
+        self.cumulative = cumulative  # Energy (mean over channels) before each hop boundary
+        self.hop = hop
+        self.length = length
+    
+    @classmethod
+    def from_audio(cls, audio: np.ndarray, hop: int = HOP, block_hops: int = 4096) -> 'LoudnessEnvelope':
+        """Measure audio (samples or channels x samples) a block at a time"""
+        length = audio.shape[-1]
+        energy = np.zeros(-(-length // hop))
+        for start in range(0, length, hop * block_hops):
+            first = start // hop
+            block_energy = cls.hop_energy(audio[..., start:start + hop * block_hops], hop)
+            energy[first:first + len(block_energy)] = block_energy
+        return cls.from_energy(energy, hop, length)
+    
+    @classmethod
+    def from_energy(cls, energy: np.ndarray, hop: int, length: int) -> 'LoudnessEnvelope':
+        """Envelope of per-hop energies (as hop_energy gives them) of `length` samples"""
+        return cls(np.concatenate([[0.0], np.cumsum(energy)]), hop, length)
+    
+    @staticmethod
+    def hop_energy(block: np.ndarray, hop: int = HOP) -> np.ndarray:
+        """Energy (mean over channels) of every hop of a block starting on a hop boundary"""
+        block = np.asarray(block, dtype=np.float64) ** 2
+        if block.ndim > 1:
+            block = np.mean(block, axis=0)
+        return np.add.reduceat(block, np.arange(0, len(block), hop))
+    
+    @classmethod
+    def from_analysis(cls, analysis: Dict) -> Optional['LoudnessEnvelope']:
+        """The envelope stored with an analysis, measured from its audio if it has none"""
+        if 'loudness' in analysis:
+            length = int(round(analysis['duration'] * analysis['sr']))
+            return cls(analysis['loudness'], analysis['loudness_hop'], length)
+        if 'audio' in analysis:
+            return cls.from_audio(analysis['audio'])
+        return None
+    
+    def window_rms(self, start: int, end: int) -> float:
+        """RMS of samples [start, end), widened to hop boundaries"""
+        first = start // self.hop
+        last = min(-(-end // self.hop), len(self.cumulative) - 1)
+        count = min(last * self.hop, self.length) - first * self.hop
+        if count <= 0:
+            return 0.0
+        return float(np.sqrt(max(self.cumulative[last] - self.cumulative[first], 0.0) / count))
+    
+    def local_rms(self, start_sample: int, sr: int) -> Optional[float]:
+        """RMS of a small window around the insertion point (None past the end)"""
+        if start_sample >= self.length:
+            return None
+        window_start = max(0, start_sample - sr // 10)  # 100ms before
+        window_end = min(self.length, start_sample + sr // 10)  # 100ms after
+        return self.window_rms(window_start, window_end)
+
+# Placement chance multiplier on the downbeat, the inner beats and the last beat of a bar
+BAR_POSITION_CHANCE = np.array([0.2, 1.0, 1.8])
+
+# Base volume range of each nuance type (rows follow NUANCE_TYPES)
+SMART_VOLUME_RANGES = np.array([
+    [0.20, 0.35],  # percussion: moderate
+    [0.15, 0.25],  # texture: very subtle
+    [0.25, 0.40],  # riser: can be more prominent
+    [0.18, 0.30],  # fx: depends on type
+])
 
 class SongNuanceGenerator:
     """Main class for analyzing songs and adding nuances"""
     
-    def __init__(self, samples_dir: str = "samples"):
-        self.catalog = NuanceCatalog(samples_dir)
+    def __init__(self, samples_dir: str = "samples", prefetch_depth: int = 0,
+                 prefetch_low_water: Optional[int] = None, workers: int = 1,
+                 analysis_cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+                 arena_path: Optional[str] = None, dtype=np.float32, analysis_sr: int = ANALYSIS_SR,
+                 beat_tracker: str = DEFAULT_BEAT_TRACKER):
+        # Sample dtype used from decoding through synthesis, mixing and writing
+        self.dtype = np.dtype(dtype)
+        # Rate features are extracted at (songs are still rendered at their own rate)
+        self.analysis_sr = analysis_sr
+        # Default beat tracking backend (see beat_tracking.py); fails early if unavailable
+        self.beat_tracker = get_beat_tracker(beat_tracker).name
+        self.catalog = NuanceCatalog(samples_dir, prefetch_depth, prefetch_low_water,
+                                     arena_path=arena_path, dtype=self.dtype)
+        self.workers = workers  # Processes used to synthesize event samples (1 = inline)
+        self._synthesis_pool = None
+        self._pool_lock = threading.Lock()
         self.default_params = {
             'creativity_level': 0.85,  # How often to use AI vs samples (0-1)
             'nuance_density': 1.0,     # Multiplier for number of nuances (0.1-3.0)
@@ -649,313 +1036,745 @@ class SongNuanceGenerator:
             'stereo_width': 0.5,       # Stereo spread (0-1)
             'vintage_mode': False,     # Apply vintage processing
         }
-        self.analysis_cache = {}
+        # Analysis results keyed by decoded-content hash (memory + disk)
+        self.analysis_cache = AnalysisCache(analysis_cache_dir)
     
-    def analyze_song(self, audio_path: str) -> Dict:
-        """Analyze a song to extract musical features"""
-        print(f"Analyzing {audio_path}...")
-        
-        # Load audio
-        y, sr = librosa.load(audio_path, sr=None)
-        
-        # Extract tempo and beats
-        tempo, beats = librosa.beat.beat_track(y=y, sr=sr, units='time')
+    def new_session(self, params: Optional[Dict] = None, seed: Optional[int] = None) -> RenderSession:
+        """Per-render state for the given parameters (merged with the defaults) and seed"""
+        return RenderSession({**self.default_params, **(params or {})}, list(self.catalog.samples), seed)
+    
+    def analyze_song(self, audio_path: AudioSource, keep_audio: bool = True,
+                     beat_tracker: Optional[str] = None) -> Dict:
+        """Analyze a song to extract musical features
+        
+        `audio_path` may also be a file-like object (e.g. an upload held in
+        memory), which is decoded directly. With `keep_audio=False` the
+        streaming renderer reads the file itself, so a path is decoded block by
+        block and only its mono fold-down at the analysis rate is ever held.
+        `beat_tracker` overrides the generator's beat tracking backend for
+        this song.
+        """
+        tracker = get_beat_tracker(beat_tracker or self.beat_tracker)
+        print(f"Analyzing {source_name(audio_path)}...")
+        
+        # Load audio, keeping the original channel layout for rendering
+        with stage('decode', 'analysis'):
+            if keep_audio or not is_path(audio_path):
+                y, sr = self._load_song(audio_path)
+                song = None
+            else:
+                y = None
+                song = self._decode_blocks(audio_path, tracker)
+                sr = song['sr']
+        
+        # Reuse a previous analysis of the same decoded audio (and settings) if there is one
+        if y is not None:
+            song = {'sr': sr, 'channels': 1 if y.ndim == 1 else y.shape[0], 'length': y.shape[-1],
+                    'content_hash': content_hash(y, sr)}
+        cache_key = f"{song['content_hash']}_{self.analysis_variant(tracker.name)}"
+        features = self.analysis_cache.get(cache_key)
+        if features is not None:
+            print(f"Analysis loaded from cache: {features['tempo']:.1f} BPM, "
+                  f"{len(features['beats'])} beats, {len(features['sections'])} sections")
+            return self._analysis_result(song, features, y if keep_audio else None)
+        
+        # Features are extracted from a cheap mono fold-down at the analysis
+        # rate, sharing one spectrogram that is only computed when needed
+        if y is not None:
+            mono = librosa.to_mono(y)
+            spectral = SongFeatures(mono, sr, self.analysis_sr)
+            tracker_audio, tracker_sr = mono, sr
+        else:
+            spectral = SongFeatures(song.pop('mono'), song['mono_sr'], self.analysis_sr)
+            tracker_audio, tracker_sr = song.pop('tracker_audio'), tracker.audio_sr
         
-        # Extract downbeats (stronger beats)
-        # For now, assume every 4th beat is a downbeat
-        downbeats = beats[::4]
+        # Extract tempo, beats and downbeats (stronger beats)
+        with stage('beat_tracking', 'analysis', backend=tracker.name):
+            tempo, beats, downbeats = tracker.track(spectral, tracker_audio, tracker_sr)
+        del tracker_audio
         
         # Detect sections using spectral features
-        chroma = librosa.feature.chroma_stft(y=y, sr=sr)
-        # Simplify section detection for now
-        sections = self._detect_sections(chroma, beats)
+        sections = self._detect_sections(spectral, beats, downbeats)
+        spectral.release()
         
-        analysis = {
-            'audio': y,
-            'sr': sr,
+        # Loudness of the original song, for adaptive event volume
+        if y is not None:
+            with stage('loudness', 'analysis'):
+                loudness = LoudnessEnvelope.from_audio(y)
+        else:
+            loudness = song.pop('loudness')
+        
+        features = {
             'tempo': tempo,
             'beats': beats,
             'downbeats': downbeats,
-            'sections': sections,
-            'duration': len(y) / sr
+            'beat_tracker': tracker.name,
+            'sections': [{**section, 'start_time': float(section['start_time'])} for section in sections],
+            'duration': song['length'] / sr,
+            'loudness': loudness.cumulative,
+            'loudness_hop': loudness.hop
         }
+        self.analysis_cache.put(cache_key, features)
+        
+        print(f"Analysis complete: {features['tempo']:.1f} BPM, {len(beats)} beats, {len(sections)} sections")
+        return self._analysis_result(song, features, y if keep_audio else None)
+    
+    def _decode_blocks(self, path: str, tracker, block_size: int = 128 * LoudnessEnvelope.HOP) -> Dict:
+        """Decode a song for analysis block by block, never holding it at its native rate
         
-        print(f"Analysis complete: {float(tempo):.1f} BPM, {len(beats)} beats, {len(sections)} sections")
+        Each block is hashed, measured for the loudness envelope and folded to
+        mono, which is resampled on the fly to the analysis rate (and to the
+        rate the beat tracker listens at, if it needs audio). Gives the same
+        hash, envelope and analysis signal as decoding the whole song.
+        """
+        with sf.SoundFile(path) as reader:
+            sr, channels = reader.samplerate, reader.channels
+            mono_sr = min(sr, self.analysis_sr)
+            hasher = ContentHash(sr, self.dtype)
+            resamplers = {'mono': StreamingResampler(sr, mono_sr, self.dtype)}
+            if tracker.audio_sr:
+                resamplers['tracker_audio'] = StreamingResampler(sr, tracker.audio_sr, self.dtype)
+            energy = []
+            for block in reader.blocks(block_size, dtype=self.dtype.name, always_2d=True):
+                hasher.update(block)
+                energy.append(LoudnessEnvelope.hop_energy(block.T))
+                mono = librosa.to_mono(block.T)
+                for resampler in resamplers.values():
+                    resampler.add(mono)
+        
+        song = {'sr': sr, 'channels': channels, 'length': hasher.frames,
+                'content_hash': hasher.hexdigest(), 'mono_sr': mono_sr,
+                'loudness': LoudnessEnvelope.from_energy(np.concatenate(energy) if energy else np.zeros(0),
+                                                         LoudnessEnvelope.HOP, hasher.frames)}
+        for name, resampler in resamplers.items():
+            song[name] = resampler.result()
+        song.setdefault('tracker_audio', None)
+        return song
+    
+    def analysis_variant(self, beat_tracker: Optional[str] = None) -> str:
+        """Analysis settings that change the features, part of their cache key"""
+        return f"sr{self.analysis_sr}_{beat_tracker or self.beat_tracker}"
+    
+    def _load_song(self, source: AudioSource) -> Tuple[np.ndarray, int]:
+        """Decode a song at its native rate and channel layout"""
+        try:
+            return librosa.load(source, sr=None, mono=False, dtype=self.dtype)
+        except Exception:
+            if is_path(source):
+                raise
+        # soundfile can't parse this stream (e.g. AAC in M4A) and the audioread
+        # fallback only reads real files, so hand it a self-deleting copy
+        source.seek(0)
+        with tempfile.NamedTemporaryFile() as copy:
+            shutil.copyfileobj(source, copy)
+            copy.flush()
+            return librosa.load(copy.name, sr=None, mono=False, dtype=self.dtype)
+    
+    def _analysis_result(self, song: Dict, features: Dict, y: Optional[np.ndarray]) -> Dict:
+        analysis = {'sr': song['sr'], 'channels': song['channels'],
+                    'content_hash': song['content_hash'], **features}
+        if y is not None:
+            analysis['audio'] = y
         return analysis
     
-    def _detect_sections(self, chroma, beats, segment_length=8):
-        """Simple section detection based on spectral changes"""
-        # For MVP, just create sections every 8 bars (32 beats)
-        sections = []
-        bars_per_section = 8
-        beats_per_bar = 4
-        beats_per_section = bars_per_section * beats_per_bar
-        
-        for i in range(0, len(beats), beats_per_section):
-            if i < len(beats):
-                sections.append({
-                    'start_beat': i,
-                    'start_time': beats[i] if i < len(beats) else beats[-1],
-                    'type': 'verse' if (i // beats_per_section) % 2 == 0 else 'chorus'
-                })
-        
-        return sections
-    
-    def schedule_nuances(self, analysis: Dict, params=None) -> List[Dict]:
-        """Schedule when and where to place nuances based on parameters"""
-        if params is None:
-            params = self.default_params
-            
-        events = []
-        beats = analysis['beats']
-        sections = analysis['sections']
+    @profiled('analysis', 'sections')
+    def _detect_sections(self, spectral: SongFeatures, beats, downbeats=None, kernel_beats=16,
+                         min_section_bars=4):
+        """Section boundaries where the song's harmony and timbre change
+        
+        Chroma and MFCCs are aggregated per beat, and a checkerboard kernel
+        spanning `kernel_beats` on either side slides along the diagonal of
+        their self-similarity, so only a band of it is ever computed and the
+        cost grows linearly with the song. Novelty peaks at least
+        `min_section_bars` apart start new sections, snapped to the nearest
+        downbeat. Sections louder than the song's median are labelled chorus.
+        """
+        if len(beats) == 0:
+            return []
+        bar_number, beat_in_bar, bar_length = bar_positions(beats, downbeats)
+        bar_starts = np.flatnonzero(beat_in_bar == 0)
+        novelty = checkerboard_novelty(spectral.beat_features(beats), kernel_beats)
+        last_bar = bar_number[-1] + 1
+        starts = [0]
+        for peak in novelty_boundaries(novelty, min_section_bars * int(np.median(bar_length))):
+            start = int(bar_starts[np.argmin(np.abs(bar_starts - peak))])
+            if (min_section_bars <= bar_number[start] - bar_number[starts[-1]]
+                    and bar_number[start] <= last_bar - min_section_bars):
+                starts.append(start)
+        
+        energy = spectral.beat_energy(beats)
+        section_energy = [float(np.mean(energy[start:end]))
+                          for start, end in zip(starts, starts[1:] + [len(beats)])]
+        median_energy = np.median(section_energy)
+        return [{
+            'start_beat': start,
+            'start_time': beats[start],
+            'type': 'chorus' if len(starts) > 1 and level > median_energy else 'verse'
+        } for start, level in zip(starts, section_energy)]
+    
+    @profiled('render', 'scheduling')
+    def schedule_nuances(self, analysis: Dict, params=None, seed: Optional[int] = None,
+                         session: Optional[RenderSession] = None) -> EventTable:
+        """Schedule when and where to place nuances based on parameters
+        
+        Every random value is drawn up front as arrays, a fixed row per beat,
+        and the bar-position and section multipliers are applied as masks, so
+        beat grids of multi-hour sets schedule in a few vectorized passes.
+        Returns the events as an EventTable (rows read like event dicts).
+        
+        With a seed, scheduling is reproducible and every event gets its own
+        seed tied to its beat index, so events on the same beat keep their
+        sample when other parameters are tweaked. Pass the render's `session`
+        instead of params/seed to schedule within it.
+        """
+        if session is None:
+            session = self.new_session(params, seed)
+        params = session.params
+        
+        beats = np.asarray(analysis['beats'], dtype=np.float64)
         tempo = analysis['tempo']
+        bar_number, beat_in_bar, bar_length = bar_positions(beats, analysis.get('downbeats'))
+        bar_position = np.where(beat_in_bar == 0, 0, np.where(beat_in_bar == bar_length - 1, 2, 1))
         
-        # Apply nuance density parameter (0.1 to 3.0)
-        base_placement_chance = 0.08 * params['nuance_density']
+        # Uniforms per beat: type, placement, jitter, base volume, volume variation
+        draws = session.np_rng.random((len(beats), 5))
         
-        # Apply texture preference to type selection
-        texture_bias = params['texture_preference']  # 0=percussion, 1=texture
+        # Apply nuance density parameter (0.1 to 3.0), with a higher chance on
+        # the last beat of bars and a lower one on downbeats
+        chance = 0.08 * params['nuance_density'] * BAR_POSITION_CHANCE[bar_position]
         
-        # Go through beats and decide where to place nuances
-        for i, beat_time in enumerate(beats):
-            beat_in_bar = i % 4
-            bar_number = i // 4
-            
-            # Apply randomness parameter to timing
-            randomness = params['randomness']
-            timing_offset = random.uniform(-randomness * 0.1, randomness * 0.1)
-            actual_time = beat_time + timing_offset
-            
-            # Higher chance at end of bars (beat 3 of 4)
-            if beat_in_bar == 3:
-                chance = base_placement_chance * 1.8
-            # Lower chance on downbeats
-            elif beat_in_bar == 0:
-                chance = base_placement_chance * 0.2
-            else:
-                chance = base_placement_chance
-            
-            # Every 8 bars, higher chance for bigger effects
-            if bar_number % 8 == 7:
-                chance *= 2.5
-                preferred_type = 'riser' if random.random() < 0.7 else 'fx'
-            else:
-                # Use texture preference to influence type selection
-                type_weights = {
-                    'percussion': (1 - texture_bias) * 2,
-                    'texture': texture_bias * 2,
-                    'riser': 0.3,
-                    'fx': 0.5
-                }
-                
-                # Normalize weights
-                total_weight = sum(type_weights.values())
-                if total_weight > 0:
-                    type_probs = {k: v/total_weight for k, v in type_weights.items()}
-                    rand = random.random()
-                    cumulative = 0
-                    for nuance_type, prob in type_probs.items():
-                        cumulative += prob
-                        if rand <= cumulative:
-                            preferred_type = nuance_type
-                            break
-                    else:
-                        preferred_type = 'texture'
-                else:
-                    preferred_type = 'texture'
-            
-            # Random placement decision
-            if random.random() < chance:
-                # Add some humanized timing jitter (±50ms)
-                jitter = random.uniform(-0.05, 0.05)
-                
-                # Smarter volume scaling based on type and context
-                base_volume = self._calculate_smart_volume(preferred_type, beat_in_bar, bar_number)
-                
-                events.append({
-                    'time': beat_time + jitter,
-                    'type': preferred_type,
-                    'beat_index': i,
-                    'bar_number': bar_number,
-                    'volume_scale': base_volume,
-                    'context': {
-                        'beat_in_bar': beat_in_bar,
-                        'section_boundary': bar_number % 8 == 7,
-                        'tempo': float(tempo)
-                    }
-                })
+        # Higher chance for bigger effects in the bar leading into each section
+        section_boundary = self._section_lead_in(analysis.get('sections'), bar_number)
+        chance[section_boundary] *= 2.5
+        
+        # Use texture preference to influence type selection (0=percussion, 1=texture)
+        texture_bias = params['texture_preference']
+        type_weights = np.array([(1 - texture_bias) * 2, texture_bias * 2, 0.3, 0.5])
+        cumulative = np.cumsum(type_weights / type_weights.sum())
+        type_code = np.minimum(np.searchsorted(cumulative, draws[:, 0]), len(NUANCE_TYPES) - 1)
+        type_code[section_boundary] = np.where(draws[section_boundary, 0] < 0.7,
+                                               NUANCE_TYPES.index('riser'), NUANCE_TYPES.index('fx'))
+        
+        # Random placement decision
+        placed = np.flatnonzero(draws[:, 1] < chance)
+        draws = draws[placed]
+        
+        # Add some humanized timing jitter (±50ms)
+        times = beats[placed] + (draws[:, 2] * 0.1 - 0.05)
+        
+        events = EventTable(times, type_code[placed], placed,
+                            self._smart_volumes(type_code[placed], beat_in_bar[placed], draws[:, 3], draws[:, 4]),
+                            # Reproduces each event's sample choice and synthesis
+                            session.event_seeds(len(beats))[placed],
+                            section_boundary[placed], tempo, bar_number[placed], beat_in_bar[placed])
         
         print(f"Scheduled {len(events)} nuance events (reduced for better taste)")
         return events
     
-    def _calculate_smart_volume(self, sample_type: str, beat_in_bar: int, bar_number: int) -> float:
-        """Calculate volume based on context for better mixing"""
-        base_volumes = {
-            'texture': random.uniform(0.15, 0.25),    # Very subtle
-            'percussion': random.uniform(0.20, 0.35), # Moderate
-            'fx': random.uniform(0.18, 0.30),         # Depends on type
-            'riser': random.uniform(0.25, 0.40)       # Can be more prominent
-        }
+    @staticmethod
+    def _section_lead_in(sections: Optional[List[Dict]], bar_number: np.ndarray) -> np.ndarray:
+        """Mask of the beats in the bar before each section change
         
-        volume = base_volumes.get(sample_type, 0.2)
+        Analyses without detected sections fall back to every 8th bar.
+        """
+        if not sections:
+            return bar_number % 8 == 7
+        lead_in = np.zeros(len(bar_number), dtype=bool)
+        for section in sections:
+            start = min(section['start_beat'], len(bar_number))
+            if start > 0:
+                lead_in |= bar_number == bar_number[start - 1]
+        return lead_in
+    
+    @staticmethod
+    def _smart_volumes(type_code: np.ndarray, beat_in_bar: np.ndarray, level: np.ndarray,
+                       variation: np.ndarray) -> np.ndarray:
+        """Volumes based on type and context for better mixing, from two uniforms per event"""
+        low, high = SMART_VOLUME_RANGES[type_code].T
+        volume = low + (high - low) * level
         
         # Reduce volume on downbeats (don't compete with main rhythm)
-        if beat_in_bar == 0:
-            volume *= 0.6
+        volume[beat_in_bar == 0] *= 0.6
         
         # Slight volume variation for human feel
-        volume *= random.uniform(0.8, 1.2)
+        volume *= 0.8 + 0.4 * variation
         
         # Ensure we don't go too loud
-        return min(volume, 0.4)
+        return np.minimum(volume, 0.4)
     
-    def apply_nuances(self, analysis: Dict, events: List[Dict], params=None) -> np.ndarray:
-        """Apply the scheduled nuances to the original audio with parameter control"""
-        if params is None:
-            params = self.default_params
-            
-        output_audio = analysis['audio'].copy()
+    def apply_nuances(self, analysis: Dict, events: Events, params=None,
+                      use_pool: bool = True, out: Optional[np.ndarray] = None,
+                      peaks: Optional[RegionPeaks] = None,
+                      session: Optional[RenderSession] = None) -> np.ndarray:
+        """Apply the scheduled nuances to the original audio with parameter control
+        
+        Every random choice for an event is drawn from its own seed, so a render
+        is reproducible as long as `use_pool` is off (pooled AI samples come from
+        random seeds). Pass `out` (e.g. a memory-mapped buffer) to mix in place
+        into it instead of a fresh copy, and `peaks` to track the running peak.
+        """
+        if session is None:
+            session = self.new_session(params)
         sr = analysis['sr']
+        loudness = LoudnessEnvelope.from_analysis(analysis)
         
-        # Update the catalog's AI generation rate based on creativity parameter
-        original_ai_rate = 0.85  # Current rate
-        self.catalog.ai_generation_rate = params['creativity_level']
-        
-        for event in events:
-            # Get a smart sample for this event 
-            sample_data = self.catalog.get_smart_sample(event['type'], event.get('context', {}))
+        with stage('mix'):
+            if out is None:
+                output_audio = analysis['audio'].copy()
+                if peaks is not None:
+                    peaks.observe(output_audio, 0)
+            else:
+                # Copy the song in region by region, measuring peaks on the way
+                output_audio = out
+                region_size = peaks.region_size if peaks is not None else 65536
+                for start in range(0, output_audio.shape[-1], region_size):
+                    output_audio[..., start:start + region_size] = analysis['audio'][..., start:start + region_size]
+                    if peaks is not None:
+                        peaks.observe(output_audio[..., start:start + region_size], start)
+        
+        # Samples are fetched (and synthesized) lazily, outside the mix stage
+        for event, sample_data in zip(events, self._event_samples(events, session, use_pool)):
             if sample_data is None:
                 print(f"No samples available for type: {event['type']}")
                 continue
             
-            # Calculate timing
-            start_sample = int(event['time'] * sr)
-            sample_audio = sample_data['audio']
-            sample_sr = sample_data.get('sr', sr)
-            
-            # Resample if necessary
-            if sample_sr != sr:
-                sample_audio = librosa.resample(sample_audio, orig_sr=sample_sr, target_sr=sr)
-            
-            # Apply intensity parameter to volume scaling
-            volume_scale = event['volume_scale'] * params['intensity']
-            
-            # Additional volume reduction for AI-generated samples (they can be loud)
-            if sample_data.get('type') == 'ai_generated':
-                volume_scale *= 0.7
-            
-            # Adaptive volume based on original song's loudness at this point
-            if start_sample < len(output_audio):
-                # Sample a small window around the insertion point
-                window_start = max(0, start_sample - sr // 10)  # 100ms before
-                window_end = min(len(output_audio), start_sample + sr // 10)  # 100ms after
+            with stage('mix'):
+                # Calculate timing
+                start_sample = int(event['time'] * sr)
                 
-                if len(output_audio.shape) == 1:
-                    local_rms = np.sqrt(np.mean(output_audio[window_start:window_end] ** 2))
-                else:
-                    local_rms = np.sqrt(np.mean(output_audio[:, window_start:window_end] ** 2))
-                
-                # Reduce nuance volume if the song is already loud at this point
-                if local_rms > 0.3:
-                    volume_scale *= 0.5
-                elif local_rms > 0.2:
-                    volume_scale *= 0.7
-            
-            sample_audio = sample_audio * volume_scale
-            
-            # Optional: Add subtle filtering for better integration
-            if event['type'] == 'texture' and random.random() < 0.3:
-                # Sometimes apply a subtle low-pass filter to textures
-                sample_audio = self._apply_subtle_filter(sample_audio, sr)
-            
-            # Mix into output (handle mono/stereo)
-            end_sample = start_sample + len(sample_audio)
-            
-            # Ensure we don't go beyond the original audio length
-            if start_sample < len(output_audio):
-                actual_end = min(end_sample, len(output_audio))
-                sample_length = actual_end - start_sample
+                # Adaptive volume based on original song's loudness at this point
+                local_rms = loudness.local_rms(start_sample, sr)
+                sample_audio = self._prepare_event_audio(event, sample_data, sr, session, local_rms,
+                                                         channels=1 if output_audio.ndim == 1 else output_audio.shape[0])
                 
-                if len(output_audio.shape) == 1:  # Mono
-                    if len(sample_audio.shape) == 1:
-                        output_audio[start_sample:actual_end] += sample_audio[:sample_length]
-                    else:
-                        # Mix stereo sample to mono
-                        output_audio[start_sample:actual_end] += np.mean(sample_audio[:sample_length], axis=0)
-                else:  # Stereo
-                    if len(sample_audio.shape) == 1:
-                        # Duplicate mono sample to stereo
-                        for ch in range(output_audio.shape[0]):
-                            output_audio[ch, start_sample:actual_end] += sample_audio[:sample_length]
-                    else:
-                        for ch in range(min(output_audio.shape[0], sample_audio.shape[0])):
-                            output_audio[ch, start_sample:actual_end] += sample_audio[ch, :sample_length]
+                # Mix into output (handle mono/stereo)
+                start, end = self._mix_into(output_audio, start_sample, sample_audio)
+                if peaks is not None:
+                    peaks.mark_dirty(start, end)
         
         return output_audio
     
-    def _apply_subtle_filter(self, audio, sr):
+    def _event_samples(self, events: Events, session: RenderSession, use_pool: bool):
+        """Samples for the given events, in order (lazily unless synthesizing in parallel)"""
+        # Resolve every event's sample up front when synthesizing in parallel
+        if self.workers > 1:
+            return self._resolve_samples_parallel(events, session)
+        # Event seeds of unseeded renders are random, so their samples aren't cached
+        cache = session.seed is not None
+        return (self.catalog.get_smart_sample(event['type'], event.get('context', {}),
+                                              seed=event.get('seed'), use_pool=use_pool,
+                                              session=session, cache=cache)
+                for event in events)
+    
+    def _prepare_event_audio(self, event: Dict, sample_data: Dict, sr: int, session: RenderSession,
+                             local_rms: Optional[float], channels: int = 1) -> np.ndarray:
+        """Resample, scale, filter and place an event's sample so it is ready to mix"""
+        params = session.params
+        event_rng = session.event_rng(event, 2)
+        
+        # Resample if necessary (cached per sample and rate)
+        sample_audio = self.catalog.resampled_audio(sample_data, sr)
+        
+        # Apply intensity parameter to volume scaling
+        volume_scale = event['volume_scale'] * params['intensity']
+        
+        # Additional volume reduction for AI-generated samples (they can be loud)
+        if sample_data.get('type') == 'ai_generated':
+            volume_scale *= 0.7
+        
+        # Reduce nuance volume if the song is already loud at this point
+        if local_rms is not None:
+            if local_rms > 0.3:
+                volume_scale *= 0.5
+            elif local_rms > 0.2:
+                volume_scale *= 0.7
+        
+        sample_audio = sample_audio * volume_scale
+        
+        # Optional: Add subtle filtering for better integration
+        if event['type'] == 'texture' and event_rng.random() < 0.3:
+            # Sometimes apply a subtle low-pass filter to textures
+            sample_audio = self._apply_subtle_filter(sample_audio, sr, event_rng)
+        
+        # Spread events across the stereo field
+        if channels == 2:
+            sample_audio = self._place_in_stereo(sample_audio, params['stereo_width'],
+                                                 session.event_rng(event, 3))
+        
+        return sample_audio
+    
+    def _place_in_stereo(self, sample_audio: np.ndarray, stereo_width: float, rng=random) -> np.ndarray:
+        """Pan an event within +/- stereo_width and scale the width of stereo samples
+        
+        Both stages are folded into one 2 x N gain matrix applied with a single
+        matrix product. Panning is equal-power, normalized so a centred event
+        keeps the level it has when duplicated to both channels.
+        """
+        pan = rng.uniform(-stereo_width, stereo_width)
+        angle = (pan + 1) * np.pi / 4
+        pan_gains = (np.sqrt(2) * np.array([np.cos(angle), np.sin(angle)])).astype(sample_audio.dtype)
+        
+        if sample_audio.ndim == 1 or sample_audio.shape[0] != 2:
+            if sample_audio.ndim > 1:
+                sample_audio = np.mean(sample_audio, axis=0)
+            return pan_gains[:, None] * sample_audio[None, :]
+        
+        # Mid/side width: 0 collapses to mono, 0.5 leaves the sample as is, 1 doubles the side
+        spread = 2 * stereo_width
+        width = np.array([[1 + spread, 1 - spread],
+                          [1 - spread, 1 + spread]], dtype=sample_audio.dtype) / 2
+        return (pan_gains[:, None] * width) @ sample_audio
+    
+    def _mix_into(self, output_audio: np.ndarray, offset: int, sample_audio: np.ndarray) -> Tuple[int, int]:
+        """Add a sample into a buffer starting at `offset` (may be negative for event tails)
+        
+        Returns the [start, end) range of the buffer that changed.
+        """
+        length = output_audio.shape[-1]
+        sample_start = max(0, -offset)
+        start = max(0, offset)
+        end = min(length, offset + sample_audio.shape[-1])
+        
+        # Ensure we don't go beyond the buffer
+        if start >= end:
+            return start, start
+        sample_audio = sample_audio[..., sample_start:sample_start + end - start]
+        
+        # Fold the sample down when its layout doesn't match the output's channels
+        if sample_audio.ndim > 1 and (output_audio.ndim == 1 or sample_audio.shape[0] != output_audio.shape[0]):
+            sample_audio = np.mean(sample_audio, axis=0)
+        
+        # Mono samples broadcast across every output channel
+        output_audio[..., start:end] += sample_audio
+        return start, end
+    
+    def _render_mapped(self, analysis: Dict, events: Events, session: RenderSession,
+                       output_path: AudioSource, use_pool: bool = True,
+                       output_format: Optional[str] = None) -> float:
+        """Mix into a memory-mapped buffer and write it normalized in one pass
+        
+        The song is copied into the map once, events are mixed in place while
+        region peaks are tracked, and the normalization gain (the same one a
+        full max(|x|) pass would give) is applied block by block as the file is
+        written. File-like outputs are mixed in memory instead, so no scratch
+        file is needed. Returns the gain.
+        """
+        if not is_path(output_path):
+            buffer = np.empty(analysis['audio'].shape, dtype=self.dtype)
+            return self._mix_and_write(analysis, events, session, buffer, output_path, use_pool, output_format)
+        
+        fd, buffer_path = tempfile.mkstemp(suffix='.raw', dir=os.path.dirname(os.path.abspath(output_path)))
+        os.close(fd)
+        try:
+            buffer = np.memmap(buffer_path, dtype=self.dtype, mode='w+', shape=analysis['audio'].shape)
+            gain = self._mix_and_write(analysis, events, session, buffer, output_path, use_pool, output_format)
+            del buffer
+        finally:
+            os.remove(buffer_path)
+        return gain
+    
+    def _mix_and_write(self, analysis: Dict, events: Events, session: RenderSession, buffer: np.ndarray,
+                       output_path: AudioSource, use_pool: bool, output_format: Optional[str]) -> float:
+        peaks = RegionPeaks(buffer.shape[-1])
+        self.apply_nuances(analysis, events, use_pool=use_pool, out=buffer, peaks=peaks, session=session)
+        
+        # Normalize to prevent clipping
+        with stage('normalization'):
+            max_val = peaks.peak(buffer)
+            gain = 0.95 / max_val if max_val > 0.95 else 1.0
+        self._write_scaled(output_path, buffer, analysis['sr'], gain, peaks.region_size, output_format)
+        return gain
+    
+    @profiled('render', 'write')
+    def _write_scaled(self, output_path: AudioSource, audio: np.ndarray, sr: int, gain: float, block_size: int,
+                      output_format: Optional[str] = None):
+        """Write audio block by block, applying the gain on the way out
+        
+        The format follows the file extension for paths and defaults to WAV
+        for file-like outputs.
+        """
+        if output_format is None and not is_path(output_path):
+            output_format = 'WAV'
+        with sf.SoundFile(output_path, 'w', sr, channels=1 if audio.ndim == 1 else audio.shape[0],
+                          format=output_format) as output:
+            for start in range(0, audio.shape[-1], block_size):
+                block = audio[..., start:start + block_size]
+                if gain != 1.0:
+                    block = block * self.dtype.type(gain)
+                output.write(block if block.ndim == 1 else block.T)
+    
+    def render_streaming(self, input_path: str, output_path: AudioSource, analysis: Dict, events: Events,
+                         params=None, use_pool: bool = True, block_size: int = 65536,
+                         session: Optional[RenderSession] = None, output_format: Optional[str] = None) -> float:
+        """Render nuances block by block so memory stays flat regardless of song length
+        
+        The input is read in fixed-size blocks through soundfile. Events are
+        resolved in start-time order as their block comes up, mixed into every
+        block they overlap (tails carry across block boundaries) and each
+        finished block is written straight away to a float scratch file. A
+        second streaming pass applies the normalization gain while writing the
+        output. Returns the normalization gain.
+        
+        The input must be a path (it is read by two cursors); the output may
+        be file-like, in which case the scratch file goes to the temp dir.
+        """
+        if not is_path(input_path):
+            raise ValueError("Streaming renders need an input path, not a stream")
+        if session is None:
+            session = self.new_session(params)
+        sr = analysis['sr']
+        
+        pending = sorted(events, key=lambda event: int(event['time'] * sr))
+        loudness = LoudnessEnvelope.from_analysis(analysis)  # None for analyses without one
+        next_event = 0
+        active = []  # (start sample, prepared audio) of events still sounding
+        peak = 0.0
+        
+        scratch_base = output_path if is_path(output_path) else os.path.join(tempfile.gettempdir(), 'nuance')
+        scratch_path = f"{os.fspath(scratch_base)}.{uuid.uuid4().hex}.render.tmp"
+        try:
+            with sf.SoundFile(input_path) as reader, sf.SoundFile(input_path) as probe, \
+                    sf.SoundFile(scratch_path, 'w', sr, channels=analysis['channels'],
+                                 subtype='DOUBLE' if self.dtype == np.float64 else 'FLOAT',
+                                 format='WAV') as scratch:
+                if reader.samplerate != sr:
+                    raise ValueError(f"Analysis rate {sr} Hz does not match {input_path} ({reader.samplerate} Hz)")
+                
+                for block_start in range(0, reader.frames, block_size):
+                    # Keep the input's channel layout, (channels, samples) like librosa
+                    with stage('decode'):
+                        block = reader.read(block_size, dtype=self.dtype.name, always_2d=True).T
+                    if block.shape[0] == 1:
+                        block = block[0]
+                    block_end = block_start + block.shape[-1]
+                    
+                    # Bring in the events that start inside this block
+                    starting = []
+                    while next_event < len(pending) and int(pending[next_event]['time'] * sr) < block_end:
+                        starting.append(pending[next_event])
+                        next_event += 1
+                    for event, sample_data in zip(starting, self._event_samples(starting, session, use_pool)):
+                        if sample_data is None:
+                            print(f"No samples available for type: {event['type']}")
+                            continue
+                        with stage('mix'):
+                            start_sample = int(event['time'] * sr)
+                            if loudness is not None:
+                                local_rms = loudness.local_rms(start_sample, sr)
+                            else:
+                                local_rms = self._read_local_rms(probe, start_sample, sr)
+                            active.append((start_sample, self._prepare_event_audio(
+                                event, sample_data, sr, session, local_rms, channels=analysis['channels'])))
+                    
+                    # Mix every sounding event, keeping only those with a tail past this block
+                    with stage('mix'):
+                        for start_sample, sample_audio in active:
+                            self._mix_into(block, start_sample - block_start, sample_audio)
+                        active = [(start_sample, sample_audio) for start_sample, sample_audio in active
+                                  if start_sample + sample_audio.shape[-1] > block_end]
+                    
+                    with stage('normalization'):
+                        if block.size:
+                            peak = max(peak, float(np.max(np.abs(block))))
+                    with stage('write'):
+                        scratch.write(block.T)
+            
+            # Normalize to prevent clipping while copying to the final file
+            gain = 0.95 / peak if peak > 0.95 else 1.0
+            with stage('write'), sf.SoundFile(scratch_path) as scratch, \
+                    sf.SoundFile(output_path, 'w', sr, channels=analysis['channels'],
+                                 format=output_format or (None if is_path(output_path) else 'WAV')) as output:
+                for block in scratch.blocks(blocksize=block_size, dtype=self.dtype.name):
+                    output.write(block * self.dtype.type(gain) if gain != 1.0 else block)
+        finally:
+            if os.path.exists(scratch_path):
+                os.remove(scratch_path)
+        
+        return gain
+    
+    def _read_local_rms(self, reader: sf.SoundFile, start_sample: int, sr: int) -> Optional[float]:
+        """Loudness window around the insertion point, read from the original file"""
+        if start_sample >= reader.frames:
+            return None
+        window_start = max(0, start_sample - sr // 10)  # 100ms before
+        window_end = min(reader.frames, start_sample + sr // 10)  # 100ms after
+        reader.seek(window_start)
+        window = reader.read(window_end - window_start, dtype=self.dtype.name, always_2d=True)
+        return float(np.sqrt(np.mean(window ** 2)))
+    
+    def _resolve_samples_parallel(self, events: Events, session: RenderSession) -> List[Dict]:
+        """Resolve all event samples, synthesizing AI samples across worker processes"""
+        # Each event carries its own seed so its synthesized sample is reproducible
+        for event in events:
+            if event.get('seed') is None:
+                event['seed'] = session.rng.getrandbits(32)
+        
+        # Library picks are cheap and depend on the session's history, so make them here
+        samples = [self.catalog.select_library_sample(event['type'], random.Random(derive_seed(event['seed'], 1)),
+                                                      session)
+                   for event in events]
+        
+        # Reuse cached syntheses; only the misses go to the worker processes. Event
+        # seeds of unseeded renders are random, so their samples aren't cached
+        cache = session.seed is not None
+        pending = []
+        for i, sample in enumerate(samples):
+            if sample is None:
+                if cache:
+                    samples[i] = self.catalog.synth_cache.get(
+                        self.catalog.synth_cache_key(events[i]['type'], events[i]['seed']))
+                if samples[i] is None:
+                    pending.append(i)
+        if not pending:
+            return samples
+        
+        with self._pool_lock:
+            if self._synthesis_pool is None:
+                self._synthesis_pool = ProcessPoolExecutor(max_workers=self.workers)
+        
+        categories = [events[i]['type'] for i in pending]
+        seeds = [events[i]['seed'] for i in pending]
+        chunksize = max(1, len(pending) // (self.workers * 4))
+        # Workers aren't profiled; the stage covers the wait for all of them
+        with stage('synthesis', 'synthesis', samples=len(pending), workers=self.workers):
+            synthesized = self._synthesis_pool.map(_synthesize_event_sample, categories, seeds,
+                                                   [self.dtype] * len(pending), chunksize=chunksize)
+            for i, seed, sample in zip(pending, seeds, synthesized):
+                if cache:
+                    self.catalog.cache_ai_sample(events[i]['type'], seed, sample)
+                samples[i] = sample
+        return samples
+    
+    def close(self):
+        """Shut down worker processes and background threads"""
+        with self._pool_lock:
+            if self._synthesis_pool is not None:
+                self._synthesis_pool.shutdown()
+                self._synthesis_pool = None
+        self.catalog.close()
+    
+    def _apply_subtle_filter(self, audio, sr, rng=random):
         """Apply a subtle low-pass filter for better integration"""
         # Simple one-pole low-pass filter
-        cutoff = random.uniform(3000, 8000)  # Random cutoff frequency
+        cutoff = rng.uniform(3000, 8000)  # Random cutoff frequency
         alpha = 2 * np.pi * cutoff / sr
         alpha = alpha / (1 + alpha)  # Normalize
         
-        filtered = np.zeros_like(audio)
-        filtered[0] = audio[0]
-        for i in range(1, len(audio)):
-            filtered[i] = alpha * audio[i] + (1 - alpha) * filtered[i-1]
-        
-        return filtered
+        return one_pole_lowpass(audio, alpha)
     
-    def process_song(self, input_path: str, output_path: str, params=None) -> Dict:
-        """Main function to process a song and add nuances with customizable parameters"""
-        print(f"Processing {input_path} -> {output_path}")
-        
-        # Merge user params with defaults
-        if params is None:
-            params = {}
-        combined_params = {**self.default_params, **params}
+    def render(self, input_path: AudioSource, params=None, seed: Optional[int] = None,
+               analysis: Optional[Dict] = None,
+               beat_tracker: Optional[str] = None) -> Tuple[np.ndarray, int, float, Dict]:
+        """Render a song in memory without writing anything
+        
+        Returns the mixed audio (channels, samples), its sample rate, the
+        normalization gain to apply when encoding it, and the nuance map. Used
+        to stream results straight back to a client. Pass a previous
+        `analysis` (with its audio) to skip decoding and analysis; the input
+        then only names the song. `beat_tracker` picks the backend used to
+        analyze it otherwise. The map carries the render's per-stage timings.
+        """
+        session = self.new_session(params, seed)
+        profiler = StageProfiler()
+        with profiler.activate(), profiler.stage('render'):
+            if analysis is None:
+                analysis = self.analyze_song(input_path, beat_tracker=beat_tracker)
+            events = self.schedule_nuances(analysis, session=session)
+            
+            peaks = RegionPeaks(analysis['audio'].shape[-1])
+            audio = self.apply_nuances(analysis, events, use_pool=seed is None, peaks=peaks, session=session)
+            with stage('normalization'):
+                max_val = peaks.peak(audio)
+                gain = 0.95 / max_val if max_val > 0.95 else 1.0
+        
+        print(f"Rendering complete! Added {len(events)} nuances.")
+        nuance_map = self._nuance_map(input_path, None, seed, analysis, events)
+        nuance_map['timings'] = profiler.totals()
+        return audio, analysis['sr'], gain, nuance_map
+    
+    def process_song(self, input_path: AudioSource, output_path: AudioSource, params=None,
+                     seed: Optional[int] = None, streaming: bool = False,
+                     output_format: Optional[str] = None, analysis: Optional[Dict] = None,
+                     profile: bool = False, beat_tracker: Optional[str] = None) -> Dict:
+        """Main function to process a song and add nuances with customizable parameters
+        
+        Passing a seed makes the render reproducible: identical inputs, parameters
+        and seed give identical output, and repeat renders reuse cached samples.
+        With `streaming`, the render reads and writes the song in blocks so memory
+        stays flat for hour-long inputs (the input must be readable by soundfile).
+        
+        Input and output may be file-like objects as well as paths; the nuance
+        map is only saved next to path outputs. `output_format` (e.g. 'FLAC')
+        overrides the format implied by the output's extension (WAV for streams).
+        A previous `analysis` of the same song skips decoding and analysis (it
+        must hold the audio unless streaming); it is not modified. Otherwise
+        `beat_tracker` picks the beat tracking backend ('librosa', 'madmom'
+        or the fast 'preview'; the generator's default if None).
+        
+        Every render records the wall and CPU time of its stages (decode, beat
+        tracking, synthesis per generator and effect, mixing, write, ...) and
+        stores the totals under 'timings' in the nuance map. With `profile`,
+        a summary table is printed too, and for path outputs the full Chrome
+        trace is saved next to the output.
+        """
+        print(f"Processing {source_name(input_path)} -> {source_name(output_path)}")
         
-        # Analyze the song
-        analysis = self.analyze_song(input_path)
+        # Everything this render changes lives in its session (params merged with defaults)
+        session = self.new_session(params, seed)
+        profiler = StageProfiler()
         
-        # Schedule nuances with parameters
-        events = self.schedule_nuances(analysis, combined_params)
+        with profiler.activate(), profiler.stage('process_song'):
+            # Analyze the song
+            if analysis is None:
+                analysis = self.analyze_song(input_path, keep_audio=not streaming, beat_tracker=beat_tracker)
+            
+            # Schedule nuances with parameters
+            events = self.schedule_nuances(analysis, session=session)
+            
+            # Apply nuances with parameters (pooled samples would break reproducibility)
+            if streaming:
+                self.render_streaming(input_path, output_path, analysis, events,
+                                      use_pool=seed is None, session=session, output_format=output_format)
+            else:
+                # Mix in place into a memory-mapped buffer and normalize while saving
+                self._render_mapped(analysis, events, session, output_path, use_pool=seed is None,
+                                    output_format=output_format)
         
-        # Apply nuances with parameters
-        output_audio = self.apply_nuances(analysis, events, combined_params)
+        nuance_map = self._nuance_map(input_path, output_path, seed, analysis, events)
+        nuance_map['timings'] = profiler.totals()
+        print(f"Processing complete! Added {len(events)} nuances.")
         
-        # Normalize to prevent clipping
-        max_val = np.max(np.abs(output_audio))
-        if max_val > 0.95:
-            output_audio = output_audio * (0.95 / max_val)
+        if profile:
+            print(f"\n{profiler.summary()}\n")
+            if is_path(output_path):
+                trace_path = profile_trace_path(output_path)
+                profiler.save_trace(trace_path)
+                print(f"Profile trace saved to: {trace_path} (open in chrome://tracing or ui.perfetto.dev)")
         
-        # Save output
-        sf.write(output_path, output_audio, analysis['sr'])
+        # Save nuance map
+        if is_path(output_path):
+            map_path = nuance_map_path(output_path)
+            with open(map_path, 'w') as f:
+                json.dump(nuance_map, f, indent=2)
+            print(f"Nuance map saved to: {map_path}")
         
-        # Create nuance map
-        nuance_map = {
-            'input_file': input_path,
-            'output_file': output_path,
+        return nuance_map
+    
+    def _nuance_map(self, input_path: AudioSource, output_path: Optional[AudioSource], seed: Optional[int],
+                    analysis: Dict, events: Events) -> Dict:
+        return {
+            'input_file': source_name(input_path),
+            'output_file': source_name(output_path) if output_path is not None else None,
+            'seed': seed,
             'analysis': {
                 'tempo': float(analysis['tempo']),
                 'duration': analysis['duration'],
                 'num_beats': len(analysis['beats']),
-                'num_sections': len(analysis['sections'])
+                'num_sections': len(analysis['sections']),
+                'beat_tracker': analysis.get('beat_tracker')
             },
-            'events': events
+            'events': event_dicts(events)
         }
-        
-        # Save nuance map
-        map_path = output_path.replace('.wav', '_nuance_map.json')
-        with open(map_path, 'w') as f:
-            json.dump(nuance_map, f, indent=2)
-        
-        print(f"Processing complete! Added {len(events)} nuances.")
-        print(f"Nuance map saved to: {map_path}")
-        
-        return nuance_map
 
 # Example usage
 if __name__ == "__main__":
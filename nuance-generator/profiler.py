@@ -0,0 +1,132 @@
+"""
+Per-stage profiling of renders
+
+A StageProfiler records the wall and CPU time of named stages (decode, beat
+tracking, synthesis per generator and effect, mixing, write, ...) as Chrome
+trace events, viewable in chrome://tracing or Perfetto. The profiler of the
+current render is held in a context variable, so instrumented code doesn't
+need it passed in and concurrent renders (each in its own thread) record
+into their own profiler. Without an active profiler, stages cost one
+context-variable lookup.
+"""
+
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Dict, List, Optional
+
+_active_profiler = contextvars.ContextVar('stage_profiler', default=None)
+
+
+class StageProfiler:
+    """Records wall and CPU time of named stages as Chrome trace events
+
+    CPU time is the recording thread's own (time.thread_time), so renders
+    running in other threads don't inflate it. Stages nest: a stage's time
+    includes the stages inside it.
+    """
+
+    def __init__(self):
+        self.events: List[Dict] = []
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str, category: str = 'render', **args):
+        """Time the enclosed block as one stage; `args` are shown with it in the trace"""
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall_start
+            cpu = time.thread_time() - cpu_start
+            event = {
+                'name': name,
+                'cat': category,
+                'ph': 'X',
+                'ts': (wall_start - self._origin) * 1e6,
+                'dur': wall * 1e6,
+                'pid': os.getpid(),
+                'tid': threading.get_ident(),
+                'args': {'cpu_ms': cpu * 1000, **args},
+            }
+            with self._lock:
+                self.events.append(event)
+
+    @contextmanager
+    def activate(self):
+        """Make this the profiler that stage() records into, within the block"""
+        token = _active_profiler.set(self)
+        try:
+            yield self
+        finally:
+            _active_profiler.reset(token)
+
+    def totals(self) -> Dict[str, Dict]:
+        """Call count and total wall and CPU seconds per stage name"""
+        totals = {}
+        with self._lock:
+            events = list(self.events)
+        for event in events:
+            entry = totals.setdefault(event['name'], {'count': 0, 'wall': 0.0, 'cpu': 0.0})
+            entry['count'] += 1
+            entry['wall'] += event['dur'] / 1e6
+            entry['cpu'] += event['args']['cpu_ms'] / 1000
+        return {name: {'count': entry['count'], 'wall': round(entry['wall'], 6), 'cpu': round(entry['cpu'], 6)}
+                for name, entry in totals.items()}
+
+    def trace(self) -> Dict:
+        """The recorded stages in Chrome trace-event format"""
+        with self._lock:
+            events = sorted(self.events, key=lambda event: event['ts'])
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def save_trace(self, path: str):
+        with open(path, 'w') as f:
+            json.dump(self.trace(), f)
+
+    def summary(self) -> str:
+        """Table of stage totals, slowest first, with each stage's share of the longest"""
+        totals = self.totals()
+        if not totals:
+            return "No stages recorded"
+        longest = max(entry['wall'] for entry in totals.values()) or 1.0
+        lines = [f"{'stage':<32}{'calls':>7}{'wall ms':>12}{'cpu ms':>12}{'share':>8}"]
+        for name, entry in sorted(totals.items(), key=lambda item: -item[1]['wall']):
+            lines.append(f"{name:<32}{entry['count']:>7}{entry['wall'] * 1000:>12.1f}"
+                         f"{entry['cpu'] * 1000:>12.1f}{entry['wall'] / longest:>8.1%}")
+        return '\n'.join(lines)
+
+
+def active_profiler() -> Optional[StageProfiler]:
+    """The profiler activated in this context, if any"""
+    return _active_profiler.get()
+
+
+def stage(name: str, category: str = 'render', **args):
+    """Time the enclosed block on the active profiler (a no-op without one)"""
+    profiler = active_profiler()
+    if profiler is None:
+        return nullcontext()
+    return profiler.stage(name, category, **args)
+
+
+def profiled(category: str, name: Optional[str] = None):
+    """Decorator recording every call of a function as a stage (named after it by default)"""
+    def decorate(func):
+        stage_name = name or func.__name__.lstrip('_')
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            profiler = active_profiler()
+            if profiler is None:
+                return func(*args, **kwargs)
+            with profiler.stage(stage_name, category):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
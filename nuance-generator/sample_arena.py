@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Packed float32 sample arena
+
+Compiles a sample library into one contiguous float32 file plus an offsets
+table. Loading an arena memory-maps the file read-only, so every sample is a
+zero-copy view and several worker processes share a single page-cached copy
+of the library.
+
+Usage: python sample_arena.py samples/ library   (writes library.f32 + library.json)
+"""
+
+import json
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import librosa
+import numpy as np
+
+from sample_manifest import SampleManifest
+
+ARENA_VERSION = 1
+CATEGORIES = ['percussion', 'texture', 'riser', 'fx']
+
+
+class SampleRecord:
+    """Compact catalog entry for a library sample
+
+    Supports the read-only mapping access (`sample['audio']`, `sample.get('sr')`)
+    used for sample dicts elsewhere, so library and AI samples can be handled
+    alike.
+    """
+
+    __slots__ = ('path', 'name', 'category', 'sr', 'duration', 'audio')
+    type = 'file'
+
+    def __init__(self, path: str, name: str, category: str, sr: int, duration: float,
+                 audio: Optional[np.ndarray] = None):
+        self.path = path
+        self.name = name
+        self.category = category
+        self.sr = sr
+        self.duration = duration
+        self.audio = audio  # A view into the arena, or decoded audio (None in the catalog's index)
+
+    def __getitem__(self, key: str):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key: str, value):
+        setattr(self, key, value)
+
+    def get(self, key: str, default=None):
+        return getattr(self, key, default)
+
+
+def arena_paths(arena_path: str):
+    base = Path(arena_path)
+    return base.with_suffix('.f32'), base.with_suffix('.json')
+
+
+def compile_arena(samples_dir: str, arena_path: str, categories: List[str] = CATEGORIES) -> int:
+    """Decode every sample in the library into a packed arena; returns the sample count"""
+    data_path, index_path = arena_paths(arena_path)
+    manifest = SampleManifest(Path(samples_dir), categories)
+    if manifest.refresh():
+        manifest.save()
+
+    entries = []
+    offset = 0
+    with open(data_path, 'wb') as data:
+        for category in categories:
+            for entry in manifest.category_entries(category):
+                path = Path(samples_dir) / entry['path']
+                try:
+                    audio, sr = librosa.load(str(path), sr=None)
+                except Exception as e:
+                    print(f"Error loading {path}: {e}")
+                    continue
+                audio = np.ascontiguousarray(audio, dtype=np.float32)
+                data.write(audio.tobytes())
+                entries.append({
+                    'path': str(path),
+                    'name': path.stem,
+                    'category': category,
+                    'sr': sr,
+                    'offset': offset,
+                    'length': len(audio),
+                })
+                offset += len(audio)
+
+    with open(index_path, 'w') as f:
+        json.dump({'version': ARENA_VERSION, 'entries': entries}, f)
+    return len(entries)
+
+
+def load_arena(arena_path: str, categories: List[str] = CATEGORIES) -> Dict[str, List[SampleRecord]]:
+    """Memory-map an arena and return zero-copy sample records per category"""
+    data_path, index_path = arena_paths(arena_path)
+    with open(index_path) as f:
+        index = json.load(f)
+    if index.get('version') != ARENA_VERSION:
+        raise ValueError(f"Unsupported arena version in {index_path}")
+
+    total = sum(entry['length'] for entry in index['entries'])
+    arena = np.memmap(data_path, dtype=np.float32, mode='r', shape=(total,)) if total else np.zeros(0, np.float32)
+
+    samples = {category: [] for category in categories}
+    for entry in index['entries']:
+        if entry['category'] not in samples:
+            continue
+        audio = arena[entry['offset']:entry['offset'] + entry['length']]
+        samples[entry['category']].append(SampleRecord(
+            entry['path'], entry['name'], entry['category'], entry['sr'],
+            entry['length'] / entry['sr'], audio
+        ))
+    return samples
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print(__doc__.strip().splitlines()[-1])
+        sys.exit(1)
+    count = compile_arena(sys.argv[1], sys.argv[2])
+    print(f"Compiled {count} samples into {arena_paths(sys.argv[2])[0]}")
@@ -0,0 +1,93 @@
+"""
+Memory-bounded LRU cache for rendered audio buffers
+
+Used to keep synthesized nuance samples around so repeat renders with the
+same seed reuse them instead of regenerating. Entries can optionally expire
+after a time-to-live.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+
+class LRUBufferCache:
+    """Thread-safe LRU cache bounded by the total size (in bytes) of its values
+
+    With a `ttl` (seconds), entries also expire that long after they were
+    stored.
+    """
+
+    def __init__(self, max_bytes: int, ttl: Optional[float] = None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (value, nbytes, expiry time or None)
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value (marking it most recently used), or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] is not None and entry[2] <= time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value: Any, nbytes: int):
+        """Store a value, evicting least recently used entries to stay under max_bytes"""
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._expire()
+            expiry = time.monotonic() + self.ttl if self.ttl is not None else None
+            self._entries[key] = (value, nbytes, expiry)
+            self.current_bytes += nbytes
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_bytes, _) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_bytes
+
+    def _remove(self, key: Hashable):
+        _, nbytes, _ = self._entries.pop(key)
+        self.current_bytes -= nbytes
+
+    def _expire(self):
+        """Drop every expired entry (caller holds the lock)"""
+        if self.ttl is None:
+            return
+        now = time.monotonic()
+        for key in [key for key, (_, _, expiry) in self._entries.items() if expiry <= now]:
+            self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and (entry[2] is None or entry[2] > time.monotonic())
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
@@ -0,0 +1,129 @@
+"""
+On-disk manifest index of a sample library
+
+Records path, mtime, size, sample rate, duration and category for every WAV
+under the samples directory so the catalog can start without decoding any
+audio. The manifest is refreshed incrementally: category directories whose
+mtime hasn't changed are trusted as-is, and only new or modified files have
+their headers read.
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Dict, List
+
+import soundfile as sf
+
+MANIFEST_NAME = ".manifest.json"
+MANIFEST_VERSION = 1
+
+
+class SampleManifest:
+    """Index of sample files per category, persisted next to the samples"""
+
+    def __init__(self, samples_dir: Path, categories: List[str]):
+        self.samples_dir = Path(samples_dir)
+        self.categories = categories
+        self.path = self.samples_dir / MANIFEST_NAME
+        self.dir_mtimes = {}
+        self.entries = {}  # relative path -> entry
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get('version') != MANIFEST_VERSION:
+            return
+        self.dir_mtimes = data.get('dirs', {})
+        self.entries = data.get('entries', {})
+
+    def save(self) -> bool:
+        """Write the index next to the samples; returns False if the library is read-only
+
+        A library that can't be written to (shared or mounted read-only) is
+        still usable: the index just lives in memory and is rebuilt next time.
+        """
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump({'version': MANIFEST_VERSION, 'dirs': self.dir_mtimes, 'entries': self.entries}, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Not saving sample manifest {self.path}: {e} (keeping the index in memory)")
+            try:
+                tmp_path.unlink(missing_ok=True)
+            except OSError:
+                pass
+            return False
+        return True
+
+    def refresh(self, full: bool = False) -> bool:
+        """Bring the index up to date with the files on disk; returns True if it changed
+
+        Unless `full` is set, a category directory whose mtime matches the
+        manifest is not rescanned (in-place overwrites of existing files are
+        only picked up by a full refresh).
+        """
+        changed = False
+        for category in self.categories:
+            category_path = self.samples_dir / category
+            try:
+                dir_mtime = category_path.stat().st_mtime_ns
+            except FileNotFoundError:
+                dir_mtime = None
+
+            if not full and dir_mtime is not None and self.dir_mtimes.get(category) == dir_mtime:
+                continue
+
+            changed |= self._rescan(category, category_path if dir_mtime is not None else None)
+            if self.dir_mtimes.get(category) != dir_mtime:
+                self.dir_mtimes[category] = dir_mtime
+                changed = True
+        return changed
+
+    def _rescan(self, category: str, category_path) -> bool:
+        """Re-index one category, reading headers only for new or modified files"""
+        changed = False
+        old = {rel: entry for rel, entry in self.entries.items() if entry['category'] == category}
+        seen = set()
+
+        if category_path is not None:
+            with os.scandir(category_path) as it:
+                for dir_entry in it:
+                    if not dir_entry.name.lower().endswith('.wav') or not dir_entry.is_file():
+                        continue
+                    rel = f"{category}/{dir_entry.name}"
+                    seen.add(rel)
+                    stat = dir_entry.stat()
+                    entry = old.get(rel)
+                    if entry and entry['mtime'] == stat.st_mtime_ns and entry['size'] == stat.st_size:
+                        continue
+                    try:
+                        info = sf.info(dir_entry.path)
+                    except Exception as e:
+                        print(f"Error indexing {dir_entry.path}: {e}")
+                        changed |= self.entries.pop(rel, None) is not None
+                        continue
+                    self.entries[rel] = {
+                        'path': rel,
+                        'mtime': stat.st_mtime_ns,
+                        'size': stat.st_size,
+                        'sr': info.samplerate,
+                        'duration': info.duration,
+                        'category': category,
+                    }
+                    changed = True
+
+        for rel in old.keys() - seen:
+            del self.entries[rel]
+            changed = True
+        return changed
+
+    def category_entries(self, category: str) -> List[Dict]:
+        """Entries of one category in a stable (path) order"""
+        return sorted((e for e in self.entries.values() if e['category'] == category),
+                      key=lambda e: e['path'])
@@ -0,0 +1,143 @@
+"""
+Background prefetch pool of procedurally generated samples
+
+Keeps a stock of ready-made AI samples for every category so a render only
+pays for mixing. Background workers refill a category once it drops to the
+low-water mark and stop once it is back at the target depth. A category whose
+generator keeps failing is retried with a growing delay and then left alone
+until a render asks for it again.
+"""
+
+import threading
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+
+class SamplePool:
+    """Per-category pool of pre-synthesized samples, topped up by worker threads"""
+
+    # Seconds before the first retry after a failed generation (doubled each time)
+    RETRY_DELAY = 0.1
+    # Consecutive failures after which a category stops being refilled
+    MAX_FAILURES = 5
+
+    def __init__(self, generate_fn: Callable[[str], Dict], categories: List[str],
+                 target_depth: int = 8, low_water: Optional[int] = None, num_workers: int = 1):
+        if target_depth < 1:
+            raise ValueError("target_depth must be at least 1")
+        if low_water is None:
+            low_water = target_depth // 2
+        if not 0 <= low_water < target_depth:
+            raise ValueError("low_water must be between 0 and target_depth - 1")
+
+        self.generate_fn = generate_fn
+        self.target_depth = target_depth
+        self.low_water = low_water
+        self.num_workers = num_workers
+
+        self.pools = {category: deque() for category in categories}
+        self.hits = {category: 0 for category in categories}
+        self.misses = {category: 0 for category in categories}
+        # Categories currently being refilled (and how many are in flight)
+        self.refilling = set(categories)
+        self.in_flight = {category: 0 for category in categories}
+        self.failures = {category: 0 for category in categories}
+
+        self._condition = threading.Condition()
+        self._workers = []
+        self._stopped = False
+
+    def start(self):
+        """Start the background refill workers"""
+        for i in range(self.num_workers):
+            worker = threading.Thread(target=self._refill_loop, name=f"sample-pool-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def stop(self, timeout: float = 5.0):
+        """Stop the workers (samples already in the pool stay available)"""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        for worker in self._workers:
+            worker.join(timeout)
+        self._workers = []
+
+    def get(self, category: str) -> Optional[Dict]:
+        """Take a ready sample from the pool, or None on a miss"""
+        with self._condition:
+            pool = self.pools[category]
+            sample = pool.popleft() if pool else None
+            if sample is None:
+                self.misses[category] += 1
+            else:
+                self.hits[category] += 1
+            if len(pool) <= self.low_water and category not in self.refilling:
+                self.refilling.add(category)
+                self._condition.notify_all()
+        return sample
+
+    def stats(self) -> Dict:
+        """Pool depth and hit/miss counters per category"""
+        with self._condition:
+            categories = {
+                category: {
+                    'depth': len(self.pools[category]),
+                    'hits': self.hits[category],
+                    'misses': self.misses[category],
+                }
+                for category in self.pools
+            }
+        total_hits = sum(c['hits'] for c in categories.values())
+        total_requests = total_hits + sum(c['misses'] for c in categories.values())
+        return {
+            'target_depth': self.target_depth,
+            'low_water': self.low_water,
+            'categories': categories,
+            'hit_rate': total_hits / total_requests if total_requests else None,
+        }
+
+    def _next_category(self) -> Optional[str]:
+        """Pick the emptiest category that still needs refilling (lock held)"""
+        needy = [c for c in self.refilling
+                 if len(self.pools[c]) + self.in_flight[c] < self.target_depth]
+        if not needy:
+            return None
+        return min(needy, key=lambda c: len(self.pools[c]) + self.in_flight[c])
+
+    def _refill_loop(self):
+        while True:
+            with self._condition:
+                category = self._next_category()
+                while category is None and not self._stopped:
+                    self._condition.wait()
+                    category = self._next_category()
+                if self._stopped:
+                    return
+                self.in_flight[category] += 1
+
+            try:
+                sample = self.generate_fn(category)
+            except Exception as e:
+                print(f"Sample pool failed to generate {category}: {e}")
+                sample = None
+
+            with self._condition:
+                self.in_flight[category] -= 1
+                if sample is not None:
+                    self.failures[category] = 0
+                    self.pools[category].append(sample)
+                else:
+                    self.failures[category] += 1
+                    failures = self.failures[category]
+                    if failures >= self.MAX_FAILURES:
+                        # Give up until a get() finds the category low again
+                        print(f"Sample pool stopped refilling {category} after {failures} failures")
+                        self.failures[category] = 0
+                        self.refilling.discard(category)
+                    else:
+                        # Back off so a broken generator doesn't spin a core
+                        self._condition.wait_for(lambda: self._stopped,
+                                                 timeout=self.RETRY_DELAY * 2 ** (failures - 1))
+                if len(self.pools[category]) >= self.target_depth:
+                    self.refilling.discard(category)
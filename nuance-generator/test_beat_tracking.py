@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Tests for the beat tracking backends and bar positions
+madmom is replaced by fake modules, so these run without it installed
+"""
+
+import sys
+import types
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from analysis_engine import SongFeatures
+from beat_tracking import MadmomBeatTracker, bar_positions
+
+
+def fake_madmom(grid):
+    """Stand-in madmom modules whose DBN tracker returns `grid`; records the input signal"""
+    calls = {}
+
+    class Signal(np.ndarray):
+        def __new__(cls, data, sample_rate=None, num_channels=None):
+            calls['signal'] = (np.asarray(data), sample_rate, num_channels)
+            return np.asarray(data).view(cls)
+
+    class RNNDownBeatProcessor:
+        def __call__(self, signal):
+            return np.zeros((len(signal) * 100 // MadmomBeatTracker.SR, 2))
+
+    class DBNDownBeatTrackingProcessor:
+        def __init__(self, beats_per_bar, fps):
+            calls['dbn'] = (beats_per_bar, fps)
+
+        def __call__(self, activations):
+            return grid
+
+    signal_module = types.ModuleType('madmom.audio.signal')
+    signal_module.Signal = Signal
+    downbeats_module = types.ModuleType('madmom.features.downbeats')
+    downbeats_module.RNNDownBeatProcessor = RNNDownBeatProcessor
+    downbeats_module.DBNDownBeatTrackingProcessor = DBNDownBeatTrackingProcessor
+    modules = {
+        'madmom': types.ModuleType('madmom'),
+        'madmom.audio': types.ModuleType('madmom.audio'),
+        'madmom.audio.signal': signal_module,
+        'madmom.features': types.ModuleType('madmom.features'),
+        'madmom.features.downbeats': downbeats_module,
+    }
+    return modules, calls
+
+
+class MadmomBeatTrackerTest(unittest.TestCase):
+
+    def track(self, audio, sr, grid):
+        modules, calls = fake_madmom(grid)
+        with mock.patch.dict(sys.modules, modules):
+            tracker = MadmomBeatTracker()
+            result = tracker.track(SongFeatures(audio, sr), audio, sr)
+        return result, calls
+
+    def test_beats_downbeats_and_tempo_from_grid(self):
+        sr = 44100
+        audio = np.zeros(4 * sr, dtype=np.float32)
+        # A 3/4 bar followed by a 4/4 bar at 120 BPM
+        grid = np.array([[0.5, 1], [1.0, 2], [1.5, 3], [2.0, 1], [2.5, 2], [3.0, 3], [3.5, 4]])
+        (tempo, beats, downbeats), calls = self.track(audio, sr, grid)
+
+        self.assertAlmostEqual(tempo, 120.0)
+        np.testing.assert_allclose(beats, grid[:, 0])
+        np.testing.assert_allclose(downbeats, [0.5, 2.0])
+        self.assertEqual(calls['dbn'], ([3, 4], 100))
+        signal, signal_sr, channels = calls['signal']
+        self.assertEqual((signal_sr, channels), (MadmomBeatTracker.SR, 1))
+        # 44.1 kHz songs go to the network as decoded
+        self.assertIs(signal, audio)
+
+    def test_native_rate_audio_keeps_full_band(self):
+        sr = 48000
+        t = np.arange(2 * sr) / sr
+        audio = np.sin(2 * np.pi * 15000 * t).astype(np.float32)  # Above the analysis band
+        _, calls = self.track(audio, sr, np.zeros((0, 2)))
+
+        signal, _, _ = calls['signal']
+        self.assertEqual(len(signal), 2 * MadmomBeatTracker.SR)
+        self.assertGreater(np.sqrt(np.mean(signal ** 2)), 0.5)
+
+    def test_empty_grid(self):
+        (tempo, beats, downbeats), _ = self.track(np.zeros(44100, dtype=np.float32), 44100, np.zeros((0, 2)))
+        self.assertEqual((tempo, len(beats), len(downbeats)), (0.0, 0, 0))
+
+    def test_missing_madmom_is_unavailable(self):
+        with mock.patch.dict(sys.modules, {'madmom': None}):
+            with self.assertRaises(ValueError):
+                MadmomBeatTracker()
+
+
+class BarPositionsTest(unittest.TestCase):
+
+    def test_three_four_bars_with_pickup(self):
+        beats = np.arange(8) * 0.5
+        bar, beat_in_bar, length = bar_positions(beats, beats[[2, 5]])
+        self.assertEqual(bar.tolist(), [0, 0, 1, 1, 1, 2, 2, 2])
+        self.assertEqual(beat_in_bar.tolist(), [1, 2, 0, 1, 2, 0, 1, 2])
+        self.assertEqual(length.tolist(), [3] * 8)
+
+    def test_four_four_without_downbeats(self):
+        bar, beat_in_bar, length = bar_positions(np.arange(6) * 0.5)
+        self.assertEqual(bar.tolist(), [0, 0, 0, 0, 1, 1])
+        self.assertEqual(beat_in_bar.tolist(), [0, 1, 2, 3, 0, 1])
+        self.assertEqual(length.tolist(), [4] * 6)
+
+
+if __name__ == '__main__':
+    unittest.main()